@@ -1,4 +1,15 @@
+from . import classic
+from . import search
 from .classic import *
-from .d_wave import *
+from .search import *
 
-__all__ = [classic.__all__, d_wave.__all__]
+__all__ = [classic.__all__, search.__all__]
+
+try:
+    from . import d_wave
+    # only the models are exported, d_wave.anneal and d_wave.tabu stay qualified so that
+    # annealing.anneal is always classic.anneal, whatever is installed
+    from .d_wave import NealModel, QBSolvModel
+    __all__.append(['NealModel', 'QBSolvModel'])
+except ImportError: # neal and dimod are optional, classic runs without them
+    pass
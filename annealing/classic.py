@@ -0,0 +1,260 @@
+import numpy as np
+import scipy.sparse
+
+__all__ = ['anneal', 'AnnealModel', 'anneal_batch']
+
+
+def anneal(q_mat, n_sweeps=100, beta_range=None, schedule='geometric', initial_state=None, seed=None):
+    '''
+    Simulated annealing on a QUBO Matrix, without conversion to a dict. This is the numpy fallback for
+    sub qubos when neal is not installed: sparse couplings are updated one colour class at a time, dense
+    ones (e.g. the one hot blocks of a tsp) variable by variable in the interpreter, about ten times slower
+    than neal per sweep. The default of 100 sweeps is enough for sub qubos of a few hundred variables.
+    :param q_mat: QUBO Matrix to be optimized, dense or scipy.sparse
+    :param n_sweeps: number of sweeps over all variables
+    :param beta_range: (hot, cold) inverse temperatures, derived from the matrix if not given
+    :param schedule: 'geometric' or 'linear' interpolation between the inverse temperatures
+    :param initial_state: optional start state, random if not given
+    :param seed: seed for the random number generator, drawn from the numpy global random state if not given
+    :return: solution vector and its objective value x @ q_mat @ x
+    '''
+    model = AnnealModel(q_mat, n_sweeps, beta_range, schedule)
+    return model.sample(np.zeros(model.n_vars), initial_state, seed)
+
+
+class AnnealModel():
+    '''
+    Persistent model of a sub problem for anneal. Coupling and neighbor lists are built once from
+    the constant part of the sub qubo, every sample call only adds a new linear term.
+    '''
+    def __init__(self, base, n_sweeps=100, beta_range=None, schedule='geometric'):
+        '''
+        :param base: constant part of the QUBO Matrix, dense or scipy.sparse
+        :param n_sweeps, beta_range, schedule: see anneal
+        '''
+        self.base = base
+        self.linear, self.coupling = _prepare(base)
+        self.n_vars = len(self.linear)
+        self.neighbors, self.weights = _neighbors(self.coupling)
+        self.classes = _colour_classes(self.neighbors)
+        self.coupling_sums = abs(self.coupling).sum(axis=1)
+        self.min_coupling = np.min(np.abs(self.coupling.data), initial=np.inf)
+        self.n_sweeps = n_sweeps
+        self.beta_range = beta_range
+        self.schedule = schedule
+
+
+    def sample(self, linear, initial_state=None, seed=None):
+        '''
+        :param linear: linear term added to the main diagonal of base
+        :param initial_state: optional start state, random if not given
+        :param seed: seed for the random number generator, drawn from the numpy global random state if not given
+        :return: solution vector and its objective value x @ (base + diag(linear)) @ x
+        '''
+        if seed is None:
+            seed = np.random.randint(0, 2**31 - 1)
+        rng = np.random.default_rng(seed)
+
+        if initial_state is None:
+            x = rng.integers(0, 2, self.n_vars)
+        else:
+            x = np.array(initial_state, dtype=int)
+
+        total_linear = self.linear + linear
+        betas = _schedule(total_linear, self.coupling_sums, self.min_coupling, self.n_sweeps, self.beta_range, self.schedule)
+        if len(self.classes) < self.n_vars / 2:
+            x = _class_sweep(x, total_linear, self.coupling, self.classes, betas, rng)
+        else:
+            x = _sweep(x, total_linear, self.coupling, self.neighbors, self.weights, betas, rng)
+        return x, _energy(self.base, x) + linear @ x
+
+
+def anneal_batch(q_mats, linear=None, n_sweeps=1000, beta_range=None, schedule='geometric', initial_states=None, seed=None):
+    '''
+    Simulated annealing on many small QUBO Matrices at once, every update is vectorized over the batch
+    :param q_mats: stack of QUBO Matrices (m x k x k), or one shared matrix (k x k) if linear is given
+    :param linear: optional linear terms (m x k), added to the main diagonals
+    :param n_sweeps: number of sweeps over all variables
+    :param beta_range: (hot, cold) inverse temperatures, derived per instance if not given
+    :param schedule: 'geometric' or 'linear' interpolation between the inverse temperatures
+    :param initial_states: optional start states (m x k), random if not given
+    :param seed: seed for the random number generator, drawn from the numpy global random state if not given
+    :return: solution vectors (m x k) and their objective values (m)
+    '''
+    q_mats = np.asarray(q_mats, dtype=float)
+    shared = q_mats.ndim == 2
+    if shared and linear is None:
+        raise ValueError('a shared QUBO Matrix (k x k) needs the linear terms (m x k), pass a stack (m x k x k) otherwise')
+    if linear is None:
+        linear = np.zeros((len(q_mats), q_mats.shape[-1]))
+    linear = np.asarray(linear, dtype=float)
+    n_instances, n_vars = linear.shape
+
+    # linear biases and symmetric couplings without diagonal, per instance or shared
+    diagonal = np.diagonal(q_mats, axis1=-2, axis2=-1)
+    total_linear = linear + diagonal
+    coupling = q_mats + np.swapaxes(q_mats, -2, -1)
+    coupling = coupling * (1 - np.eye(n_vars))
+
+    if seed is None:
+        seed = np.random.randint(0, 2**31 - 1)
+    rng = np.random.default_rng(seed)
+    if initial_states is None:
+        x = rng.integers(0, 2, (n_instances, n_vars))
+    else:
+        x = np.array(initial_states, dtype=int)
+
+    betas = _batch_schedule(total_linear, coupling, n_instances, n_sweeps, beta_range, schedule)
+    field = x @ coupling if shared else np.einsum('mi,mij->mj', x, coupling)
+
+    for sweep in range(n_sweeps):
+        thresholds = -np.log(1.0 - rng.random((n_instances, n_vars))) / betas[:, sweep, None]
+        for i in range(n_vars):
+            s = 1 - 2 * x[:, i]
+            accept = s * (total_linear[:, i] + field[:, i]) <= thresholds[:, i]
+            x[:, i] ^= accept
+            flip = s * accept
+            if shared:
+                field += flip[:, None] * coupling[i]
+            else:
+                field += flip[:, None] * coupling[:, i]
+
+    if shared:
+        energies = ((x @ q_mats) * x).sum(axis=1) + (linear * x).sum(axis=1)
+    else:
+        energies = np.einsum('mi,mij,mj->m', x, q_mats, x) + (linear * x).sum(axis=1)
+    return x, energies
+
+
+def _batch_schedule(linear, coupling, n_instances, n_sweeps, beta_range, schedule):
+    '''
+    :return: inverse temperatures per instance and sweep (m x n_sweeps)
+    '''
+    if beta_range is None:
+        abs_coupling = np.abs(coupling)
+        max_delta = (np.abs(linear) + abs_coupling.sum(axis=-1)).max(axis=-1)
+        coefficients = np.concatenate([np.abs(linear), np.broadcast_to(abs_coupling.reshape(-1, coupling.shape[-1] ** 2),
+                                                                       (n_instances, coupling.shape[-1] ** 2))], axis=1)
+        min_delta = np.where(coefficients > 0, coefficients, np.inf).min(axis=1)
+        valid = (max_delta > 0) & (min_delta < np.inf)
+        hot = np.where(valid, np.log(2) / np.where(valid, max_delta, 1), 1.0)
+        cold = np.where(valid, np.log(100) / np.where(valid, min_delta, 1), 1.0)
+    else:
+        hot = np.full(n_instances, float(beta_range[0]))
+        cold = np.full(n_instances, float(beta_range[1]))
+
+    steps = np.linspace(0, 1, n_sweeps)
+    if schedule == 'geometric':
+        return hot[:, None] * (cold / hot)[:, None] ** steps
+    if schedule == 'linear':
+        return hot[:, None] + (cold - hot)[:, None] * steps
+    raise ValueError(f'unknown schedule {schedule}')
+
+
+def _prepare(q_mat):
+    '''
+    :return: linear biases and the symmetric coupling matrix (q_mat + q_mat.T without diagonal) as CSR
+    '''
+    q_mat = scipy.sparse.csr_array(q_mat, dtype=float)
+    linear = q_mat.diagonal()
+    coupling = scipy.sparse.csr_array(q_mat + q_mat.T)
+    coupling.setdiag(0)
+    coupling.eliminate_zeros()
+    return linear, coupling
+
+
+def _schedule(linear, coupling_sums, min_coupling, n_sweeps, beta_range, schedule):
+    '''
+    :param coupling_sums: row sums of the absolute couplings
+    :param min_coupling: smallest absolute coupling
+    '''
+    if beta_range is None:
+        # hot: the largest possible energy change is accepted with probability 1/2,
+        # cold: the smallest energy change is accepted with probability 1/100
+        max_delta = np.max(np.abs(linear) + coupling_sums, initial=0)
+        abs_linear = np.abs(linear)
+        min_delta = min(np.min(abs_linear[abs_linear > 0], initial=np.inf), min_coupling)
+        if max_delta == 0 or min_delta == np.inf:
+            beta_range = (1.0, 1.0)
+        else:
+            beta_range = (np.log(2) / max_delta, np.log(100) / min_delta)
+
+    if schedule == 'geometric':
+        return np.geomspace(beta_range[0], beta_range[1], n_sweeps)
+    if schedule == 'linear':
+        return np.linspace(beta_range[0], beta_range[1], n_sweeps)
+    raise ValueError(f'unknown schedule {schedule}')
+
+
+def _neighbors(coupling):
+    neighbors = [coupling.indices[coupling.indptr[i]:coupling.indptr[i + 1]] for i in range(coupling.shape[0])]
+    weights = [coupling.data[coupling.indptr[i]:coupling.indptr[i + 1]] for i in range(coupling.shape[0])]
+    return neighbors, weights
+
+
+def _colour_classes(neighbors):
+    '''
+    Greedy colouring of the coupling graph, highest degree first
+    :return: index arrays of the colour classes, no two variables of a class are coupled
+    '''
+    colours = np.full(len(neighbors), -1)
+    for i in sorted(range(len(neighbors)), key=lambda i: -len(neighbors[i])):
+        used = set(colours[neighbors[i]].tolist())
+        colour = 0
+        while colour in used:
+            colour += 1
+        colours[i] = colour
+    return [np.flatnonzero(colours == colour) for colour in range(colours.max(initial=-1) + 1)]
+
+
+def _class_sweep(x, linear, coupling, classes, betas, rng):
+    '''
+    Metropolis sweeps, the variables of a colour class are not coupled, so the whole class is
+    updated at once with the same result as one variable after the other
+    '''
+    n_vars = len(linear)
+    dense = n_vars <= 1024 # small couplings are updated as dense rows
+    rows = coupling.toarray() if dense else coupling
+    field = coupling @ x
+
+    for beta in betas:
+        thresholds = -np.log(1.0 - rng.random(n_vars)) / beta
+        for index in classes:
+            s = 1 - 2 * x[index]
+            accept = s * (linear[index] + field[index]) <= thresholds[index]
+            if not accept.any():
+                continue
+            flips = index[accept]
+            x[flips] ^= 1
+            field += s[accept] @ rows[flips] if dense else rows[flips].T @ s[accept]
+    return x
+
+
+def _sweep(x, linear, coupling, neighbors, weights, betas, rng):
+    '''
+    Metropolis sweeps with incremental local fields, a flip of variable i
+    only touches the fields of the neighbors of i. Used if the coupling graph has too few
+    independent variables for _class_sweep.
+    '''
+    n_vars = len(linear)
+    field = coupling @ x
+    linear = linear.tolist()
+    state = x.tolist()
+
+    for beta in betas:
+        # a flip with energy change delta is accepted if delta <= -log(u) / beta
+        thresholds = (-np.log(1.0 - rng.random(n_vars)) / beta).tolist()
+        for i in range(n_vars):
+            s = 1 - 2 * state[i]
+            if s * (linear[i] + field[i]) <= thresholds[i]:
+                state[i] ^= 1
+                field[neighbors[i]] += s * weights[i]
+
+    return np.array(state, dtype=int)
+
+
+def _energy(q_mat, x):
+    if scipy.sparse.issparse(q_mat):
+        return x @ (q_mat @ x)
+    q_mat = np.asarray(q_mat)
+    return x @ q_mat @ x
@@ -1,9 +1,9 @@
 import numpy as np
-from dwave_qbsolv import QBSolv
+import dimod
 import neal
 import tsp_qubo
 
-__all__ = ['anneal' , 'tabu']
+__all__ = ['anneal' , 'tabu', 'NealModel', 'QBSolvModel']
 
 
 def anneal(q_mat):
@@ -29,6 +29,7 @@ def tabu(q_mat):
     '''
     :param q_mat: QUBO Matrix to be optimized
     '''
+    from dwave_qbsolv import QBSolv # optional, imported on use so that neal works without it
     Q = {
         (i, j): q_mat[i][j] for i in range(len(q_mat)) for j in range(len(q_mat)) if q_mat[i][j] != 0
     }
@@ -39,3 +40,61 @@ def tabu(q_mat):
     for key in r_dict:
         vec[key] = r_dict[key]
     return vec.astype(int), response.data_vectors['energy'][0]
+
+
+
+class NealModel():
+    '''
+    Persistent binary quadratic model of a sub problem, built once from the constant part of the
+    sub qubo. Every sample call only shifts the linear biases, no dict is rebuilt.
+    '''
+    def __init__(self, base):
+        '''
+        :param base: constant part of the QUBO Matrix
+        '''
+        self.bqm = dimod.BinaryQuadraticModel(np.asarray(base, dtype=float), 'BINARY')
+        self.variables = np.arange(len(base))
+        self._linear = np.zeros(len(base)) # linear term currently added to the model
+        self.sampler = self._sampler()
+
+
+    def _sampler(self):
+        return neal.SimulatedAnnealingSampler()
+
+
+    def _sample(self, initial_state):
+        if initial_state is None:
+            return self.sampler.sample(self.bqm, num_reads=1)
+        initial_states = (np.asarray(initial_state, dtype=np.int8).reshape(1, -1), self.variables)
+        return self.sampler.sample(self.bqm, num_reads=1, initial_states=initial_states)
+
+
+    def sample(self, linear, initial_state=None):
+        '''
+        :param linear: linear term added to the main diagonal of base
+        :param initial_state: optional start state of the annealer, e.g. for a warm start
+        :return: solution vector and its objective value
+        '''
+        linear = np.asarray(linear, dtype=float)
+        self.bqm.add_linear_from_array(linear - self._linear)
+        self._linear = linear.copy()
+
+        response = self._sample(initial_state)
+        vec = np.zeros(len(self.variables), dtype=int)
+        vec[np.asarray(response.variables, dtype=int)] = response.record.sample[0]
+        return vec, response.record.energy[0]
+
+
+
+class QBSolvModel(NealModel):
+    '''Persistent binary quadratic model of a sub problem, solved with QBSolv (tabu search)'''
+
+    def _sampler(self):
+        from dwave_qbsolv import QBSolv
+        return QBSolv()
+
+
+    def _sample(self, initial_state):
+        if initial_state is not None:
+            raise ValueError('QBSolv does not support an initial state, use QBSolvModel without warm_start')
+        return self.sampler.sample(self.bqm, num_repeats=1)
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+from .classic import _prepare, _neighbors, _energy
+
+__all__ = ['tabu_search']
+
+
+def tabu_search(q_mat, tenure=None, max_moves=None, time_limit=None, n_restarts=10, restart_after=None,
+                initial_state=None, seed=None):
+    '''
+    One flip tabu search on a QUBO Matrix. The energy change of every possible flip is kept in a
+    vector that is updated in O(degree) per move, choosing a move is one O(n) scan.
+    :param q_mat: QUBO Matrix to be optimized, dense or scipy.sparse
+    :param tenure: number of moves a flipped variable stays tabu, defaults to min(20, n / 4)
+    :param max_moves: total move budget, defaults to 100 * n
+    :param time_limit: optional time budget in seconds
+    :param n_restarts: number of restarts from a perturbed best solution
+    :param restart_after: restart after this many moves without improvement, defaults to 10 * n
+    :param initial_state: optional start state (warm start), random if not given
+    :param seed: seed for the random number generator, drawn from the numpy global random state if not given
+    :return: best solution vector and its objective value x @ q_mat @ x
+    '''
+    linear, coupling = _prepare(q_mat)
+    n_vars = len(linear)
+    neighbors, weights = _neighbors(coupling)
+    if tenure is None:
+        tenure = max(1, min(20, n_vars // 4))
+    if max_moves is None:
+        max_moves = 100 * n_vars
+    if restart_after is None:
+        restart_after = 10 * n_vars
+    if seed is None:
+        seed = np.random.randint(0, 2**31 - 1)
+    rng = np.random.default_rng(seed)
+    start_time = time.time()
+
+    if initial_state is None:
+        x = rng.integers(0, 2, n_vars)
+    else:
+        x = np.array(initial_state, dtype=int)
+
+    field, delta, energy = _reset(x, linear, coupling)
+    best_x, best_energy = x.copy(), energy
+    tabu_until = np.zeros(n_vars, dtype=int)
+    since_improvement = 0
+    restarts = 0
+
+    for move in range(max_moves):
+        if time_limit is not None and move % 100 == 0 and time.time() - start_time > time_limit:
+            break
+
+        # tabu moves are only allowed if they lead to a new best solution (aspiration)
+        forbidden = (tabu_until > move) & (energy + delta >= best_energy)
+        candidates = np.where(forbidden, np.inf, delta)
+        j = int(np.argmin(candidates))
+        if candidates[j] == np.inf:
+            tabu_until[:] = 0 # every move is tabu, release them
+            continue
+
+        # flip j, only its neighbors change their energy change
+        energy += delta[j]
+        s = 1 - 2 * x[j]
+        x[j] ^= 1
+        nbrs = neighbors[j]
+        field[nbrs] += s * weights[j]
+        delta[nbrs] = (1 - 2 * x[nbrs]) * (linear[nbrs] + field[nbrs])
+        delta[j] = -delta[j]
+        tabu_until[j] = move + tenure + 1
+
+        if energy < best_energy - 1e-9:
+            best_x, best_energy = x.copy(), energy
+            since_improvement = 0
+        else:
+            since_improvement += 1
+
+        if since_improvement >= restart_after:
+            if restarts >= n_restarts:
+                break
+            restarts += 1
+            # restart from the best solution with a random tenth of its bits flipped
+            x = best_x.copy()
+            x[rng.random(n_vars) < 0.1] ^= 1
+            field, delta, energy = _reset(x, linear, coupling)
+            tabu_until[:] = 0
+            since_improvement = 0
+
+    return best_x, _energy(q_mat, best_x)
+
+
+def _reset(x, linear, coupling):
+    '''
+    :return: local fields, energy change of every single flip and the energy of x
+    '''
+    field = coupling @ x
+    delta = (1 - 2 * x) * (linear + field)
+    energy = linear @ x + 0.5 * (x @ field)
+    return field, delta, energy
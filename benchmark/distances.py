@@ -1,14 +1,16 @@
 from .objects import TSP
+import functools
 import os
-import json
-import tsp_qubo.generate
 import numpy as np
+from util.store import InstanceStore
 
 __distances = ['distances-10-3-100', 'distances-15-1-100', 'distances-20-1-100', 'distances-30-1-100',
                'distances-50-1-100']
 
 __all__ = ['get_tsp', 'get_tsp_names', 'get_cost_function']
 
+_store = InstanceStore(os.path.join(os.path.dirname(__file__), "distances.json"))
+
 
 def get_tsp(name) -> TSP:
     """
@@ -16,11 +18,7 @@ def get_tsp(name) -> TSP:
         :param name: string, name of the tsp to be returned
         :return: problem, benchmark.TSP() class object
         """
-    problem_index = __distances.index(name)
-    f = open(os.path.join(os.path.dirname(__file__), "distances.json"), "r")
-    problems = json.load(f)
-    f.close()
-    problem = problems[problem_index]
+    problem = _store.get(__distances.index(name))
     p = TSP(
         problem['name'],
         problem['distances'],
@@ -35,23 +33,34 @@ def get_tsp_names():
     return __distances
 
 
+@functools.lru_cache(maxsize=None)
 def get_cost_function(name):
+    """
+        Returns the cost function of a tsp distance instance, prepared once per name
+        :param name: string, name of the tsp
+        :return: cost function (val) -> fitness, val is one chromosome or a batch (batch x nodes^2)
+                 with a fitness vector as result, and the chromosome size
+        """
     tsp = get_tsp(name)
     penalty = 1000
-    distance_matrix = tsp.distances
+    distance_matrix = np.array(tsp.distances, dtype=float)
+    distance_matrix.flags.writeable = False
 
     nodes = len(distance_matrix)
-    constraint_matrix = np.zeros((nodes ** 2, nodes ** 2))
-    constraint_matrix = tsp_qubo.generate.apply_penalties(constraint_matrix, penalty)
-
     chromosome_size = nodes ** 2
 
     def cost_function(val):
-        c_val = val @ constraint_matrix @ val
-        t_mat = np.reshape(val, (nodes, nodes))
+        vals = np.asarray(val, dtype=float)
+        t_mat = vals.reshape(-1, nodes, nodes)
+
+        # constraints of apply_penalties: -2 * penalty per entry, penalty per ordered pair of
+        # entries in the same row or column
+        rows = t_mat.sum(axis=2)
+        cols = t_mat.sum(axis=1)
+        c_val = penalty * (-2 * rows.sum(axis=1) + (rows * (rows - 1)).sum(axis=1) + (cols * (cols - 1)).sum(axis=1))
 
-        for t in range(nodes):
-            c_val += t_mat[t] @ distance_matrix @ t_mat[(t + 1) % nodes]
-        return c_val
+        # tour: node at position t to node at position t + 1, including the way back to the start
+        c_val = c_val + np.einsum('bti,ij,btj->b', t_mat, distance_matrix, np.roll(t_mat, -1, axis=1), optimize=True)
+        return c_val if vals.ndim == 2 else c_val[0]
 
     return cost_function, chromosome_size
@@ -1,12 +1,14 @@
 from .objects import Problem
 import os
-import json
 import numpy as np
+from util.store import InstanceStore
 
 __all__ = ['get_instance', 'get_names']
 
 problem_names = ['random-30', 'tsp-5-25-10-20', 'tsp-5-25-10-100', 'tsp-5-25-1-5']
 
+_store = InstanceStore(os.path.join(os.path.dirname(__file__), "problems.json"))
+
 
 def get_instance(name) -> Problem:
     """
@@ -14,11 +16,7 @@ def get_instance(name) -> Problem:
     :param name: string, name of the problem to be returned
     :return: problem, benchmark.Problem() class object
     """
-    problem_index = problem_names.index(name)
-    f = open(os.path.join(os.path.dirname(__file__), "problems.json"), "r")
-    problems = json.load(f)
-    f.close()
-    problem = problems[problem_index]
+    problem = _store.get(problem_names.index(name))
     p = Problem(
         problem['name'],
         problem['qubo'],
@@ -1,4 +1,5 @@
 from .write import *
 from .read import *
 from .util import *
-__all__ = [write.__all__, read.__all__, util.__all__]
\ No newline at end of file
+from .binary import *
+__all__ = [write.__all__, read.__all__, util.__all__, binary.__all__]
\ No newline at end of file
@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+
+__all__ = ['LogWriter', 'LogReader', 'load_log', 'convert_json', 'get_log_name']
+
+# layout of a log file: magic, header size (uint64), json metadata padded to a multiple of 8 bytes,
+# followed by fixed width records, one per generation
+MAGIC = b'QHEALOG1'
+DEFAULT_COLUMNS = (('generation', '<i8'), ('fitness', '<f8'))
+
+
+def get_log_name(filename : str):
+    log_name = filename + '.qlog'
+    return log_name
+
+
+class LogWriter():
+    '''
+    Append only writer of a binary experiment log. Records are buffered and written in chunks, a crashed
+    run keeps everything up to the last written chunk. An existing log is continued, a trailing partial
+    record is cut off. Can be used as sink of a qhea.recorder.Recorder.
+    '''
+    def __init__(self, path : str, label : str = '', columns = DEFAULT_COLUMNS, chunk_size : int = 256, **metadata):
+        '''
+        :param path: log file, created if it does not exist
+        :param label: label of the run, e.g. for plot legends
+        :param columns: (name, dtype) per column of a record
+        :param chunk_size: number of records buffered before they are written
+        :param metadata: further json serializable values stored in the header
+        '''
+        self.path = path
+        self.dtype = np.dtype([(name, dtype) for name, dtype in columns])
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            reader = LogReader(path)
+            if reader.dtype != self.dtype:
+                raise ValueError(f'columns of {path} do not match: {reader.dtype} != {self.dtype}')
+            self.metadata = reader.metadata
+            self.header_size = reader.header_size
+            self._file = open(path, 'r+b')
+            self._file.truncate(reader.header_size + len(reader) * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self.metadata = dict(metadata, label=label, columns=[[name, dtype] for name, dtype in columns])
+            header = _header(self.metadata)
+            self.header_size = len(header)
+            self._file = open(path, 'wb')
+            self._file.write(header)
+        self._buffer = np.empty(chunk_size, dtype=self.dtype)
+        self._n_buffered = 0
+
+
+    def write(self, *values):
+        '''
+        Appends one record, values in the order of the columns
+        '''
+        self._buffer[self._n_buffered] = values
+        self._n_buffered += 1
+        if self._n_buffered == len(self._buffer):
+            self.flush()
+
+
+    def write_records(self, records : np.ndarray):
+        '''
+        :param records: structured array with the dtype of the log
+        '''
+        self.flush()
+        self._file.write(np.ascontiguousarray(records, dtype=self.dtype).tobytes())
+        self._file.flush()
+
+
+    def truncate(self, n_records : int):
+        '''
+        Cuts the log back to its first n_records records, e.g. when a run is resumed from a checkpoint
+        '''
+        self.flush()
+        self._file.truncate(self.header_size + n_records * self.dtype.itemsize)
+        self._file.seek(0, os.SEEK_END)
+
+
+    def flush(self):
+        if self._n_buffered > 0:
+            self._file.write(self._buffer[:self._n_buffered].tobytes())
+            self._n_buffered = 0
+        self._file.flush()
+
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LogReader():
+    '''
+    Reader of a binary experiment log, the records are memory mapped, columns are accessed by name
+    '''
+    def __init__(self, path : str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not an experiment log')
+            self.header_size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            self.metadata = json.loads(f.read(self.header_size - len(MAGIC) - 8))
+        self.label = self.metadata.get('label', '')
+        self.dtype = np.dtype([(name, dtype) for name, dtype in self.metadata['columns']])
+
+        # a crashed writer may have left a partial record, it is ignored
+        n_records = (os.path.getsize(path) - self.header_size) // self.dtype.itemsize
+        if n_records > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=self.header_size, shape=(n_records,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    def __getitem__(self, column : str) -> np.ndarray:
+        return self.records[column]
+
+
+def load_log(file_path):
+    return LogReader(file_path)
+
+
+def convert_json(json_path : str, log_path : str = None) -> str:
+    '''
+    Converts a result written by json_db.save into a binary log
+    :param log_path: defaults to the json path with the ending .qlog
+    :return: path of the log
+    '''
+    if log_path is None:
+        log_path = get_log_name(os.path.splitext(json_path)[0])
+    with open(json_path, 'r') as openfile:
+        json_object = json.load(openfile)
+
+    fitness = np.asarray(json_object['evolutions'], dtype=float)
+    records = np.empty(len(fitness), dtype=np.dtype([(name, dtype) for name, dtype in DEFAULT_COLUMNS]))
+    records['generation'] = np.arange(len(fitness))
+    records['fitness'] = fitness
+
+    tmp_path = log_path + '.tmp'
+    with LogWriter(tmp_path, label=json_object.get('label', ''), source=os.path.basename(json_path)) as writer:
+        writer.write_records(records)
+    os.replace(tmp_path, log_path)
+    return log_path
+
+
+def _header(metadata):
+    text = json.dumps(metadata).encode()
+    size = len(MAGIC) + 8 + len(text)
+    text += b' ' * (-size % 8) # records start 8 byte aligned
+    size = len(MAGIC) + 8 + len(text)
+    return MAGIC + np.array([size], dtype='<u8').tobytes() + text
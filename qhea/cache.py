@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import hashlib
+import numpy as np
+
+
+class SolutionCache():
+    '''
+    Bounded cache of sub problem solutions. A sub qubo only depends on the sub problem index
+    and the frozen variables outside its block, so both together identify a solution.
+    '''
+    policies = ('lru', 'fifo')
+
+    def __init__(self, max_size : int = 10000, policy : str = 'lru'):
+        '''
+        :param max_size: maximal number of cached solutions
+        :param policy: eviction policy, 'lru' evicts the least recently used solution,
+                       'fifo' the oldest one
+        '''
+        if policy not in self.policies:
+            raise ValueError(f'unknown eviction policy {policy}, expected one of {self.policies}')
+        self.max_size = max_size
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+
+    def key(self, index : int, x : np.ndarray, d_vars_index : np.ndarray) -> tuple:
+        '''
+        :param index: index of the sub problem
+        :param x: chromosome
+        :param d_vars_index: decision variables of the sub problem, they are masked out
+        :return: sub problem index and a hash of the packed frozen bits
+        '''
+        frozen = np.array(x, dtype=bool)
+        frozen[d_vars_index] = False
+        return index, hashlib.blake2b(np.packbits(frozen).tobytes(), digest_size=16).digest()
+
+
+    def get(self, key : tuple):
+        '''
+        :return: cached (solution, energy) or None
+        '''
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == 'lru':
+            self._entries.move_to_end(key)
+        return entry
+
+
+    def put(self, key : tuple, solution : np.ndarray, energy : float):
+        self._entries[key] = (np.array(solution), energy)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get_state(self) -> dict:
+        '''
+        :return: arrays holding the entries in their eviction order and the counters, see set_state
+        '''
+        keys = list(self._entries)
+        entries = list(self._entries.values())
+        solutions = [solution for solution, _ in entries]
+        return {
+            'indices': np.array([index for index, _ in keys], dtype=np.int64),
+            'digests': np.frombuffer(b''.join(digest for _, digest in keys), dtype=np.uint8).reshape(len(keys), 16),
+            'sizes': np.array([len(solution) for solution in solutions], dtype=np.int64),
+            'solutions': np.concatenate(solutions) if len(solutions) > 0 else np.empty(0, dtype=np.int64),
+            'energies': np.array([energy for _, energy in entries], dtype=float),
+            'counters': np.array([self.hits, self.misses], dtype=np.int64)
+        }
+
+
+    def set_state(self, state : dict):
+        '''
+        Replaces entries and counters, max_size and policy stay as they are
+        '''
+        self._entries = OrderedDict()
+        solutions = np.split(state['solutions'], np.cumsum(state['sizes'])[:-1]) if len(state['sizes']) > 0 else []
+        for index, digest, solution, energy in zip(state['indices'], state['digests'], solutions, state['energies']):
+            self._entries[(int(index), digest.tobytes())] = (solution, energy)
+        self.hits, self.misses = (int(counter) for counter in state['counters'])
+
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+    def __len__(self):
+        return len(self._entries)
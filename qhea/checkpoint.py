@@ -0,0 +1,101 @@
+import json
+import os
+import numpy as np
+
+# a checkpoint is one uncompressed .npz file: the population (chromosomes bit packed), generation and budget counters,
+# parameters, the state of the global numpy random generator, the recorder and the solution cache
+VERSION = 1
+
+
+def save_checkpoint(path : str, solver):
+    '''
+    Writes the state of a Qhea solver atomically: the checkpoint is written to path + '.tmp' and renamed,
+    an interrupted write keeps the previous checkpoint
+    :param solver: qhea.solver.Qhea
+    '''
+    population = solver.population
+    parents = population.parents
+    _, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    state = {
+        'version': np.int64(VERSION),
+        'generation': np.int64(solver.generation),
+        'counters': np.array([solver.n_evaluations, solver.n_annealer_calls, solver.last_improvement], dtype=np.int64),
+        'elapsed_time': np.float64(solver.elapsed_time),
+        'parameters': np.array(json.dumps(vars(solver.parameters))),
+        'n_vars': np.int64(parents.shape[1]),
+        'parents': np.packbits(parents, axis=1),
+        'fitness': population.fitness[:population.n_individuals],
+        'rng_keys': keys,
+        'rng_position': np.int64(position),
+        'rng_gauss': np.array([has_gauss, cached_gaussian], dtype=float)
+    }
+    if population.fields is not None:
+        state['fields'] = population.fields[:population.n_individuals]
+        state['has_field'] = population.has_field[:population.n_individuals]
+    state.update(_prefixed('recorder_', solver.data.get_state()))
+    if solver.solution_cache is not None:
+        state.update(_prefixed('cache_', solver.solution_cache.get_state()))
+
+    if solver.data.sink is not None and hasattr(solver.data.sink, 'flush'):
+        solver.data.sink.flush() # the log holds at least the checkpointed generations
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **state)
+    os.replace(path + '.tmp', path)
+
+
+def load_checkpoint(path : str) -> dict:
+    '''
+    :return: arrays of a checkpoint written by save_checkpoint
+    '''
+    with np.load(path) as checkpoint:
+        state = {key: checkpoint[key] for key in checkpoint.files}
+    if state['version'] != VERSION:
+        raise ValueError(f'{path} has checkpoint version {state["version"]}, expected {VERSION}')
+    return state
+
+
+def get_parameters(state : dict) -> dict:
+    '''
+    :return: keyword arguments of qhea.parameters.Parameters stored in a checkpoint
+    '''
+    return json.loads(state['parameters'].item())
+
+
+def restore_checkpoint(solver, state : dict):
+    '''
+    Replaces the state of a Qhea solver and of the global numpy random generator by a checkpoint
+    :param solver: qhea.solver.Qhea built with the parameters of the checkpoint
+    '''
+    population = solver.population
+    n_vars = int(state['n_vars'])
+    if n_vars != population.n_vars or len(state['fitness']) != population.n_individuals:
+        raise ValueError('checkpoint does not match the qubo or the population size of the solver')
+    if ('fields' in state) != (population.fields is not None):
+        raise ValueError('checkpoint does not match the incremental_evaluation parameter of the solver')
+
+    population.parents[:] = np.unpackbits(state['parents'], axis=1, count=n_vars)
+    population.fitness[:population.n_individuals] = state['fitness']
+    if population.fields is not None:
+        population.fields[:population.n_individuals] = state['fields']
+        population.has_field[:population.n_individuals] = state['has_field']
+    solver.generation = int(state['generation'])
+    solver.mutation_rate = 1 / solver.generation if solver.generation > 0 else 0
+    solver.n_evaluations, solver.n_annealer_calls, solver.last_improvement = (int(counter) for counter in state['counters'])
+    solver.elapsed_time = float(state['elapsed_time'])
+    solver.best_fitness = population.fitness[0]
+
+    solver.data.set_state(_unprefixed('recorder_', state))
+    cache_state = _unprefixed('cache_', state)
+    if len(cache_state) > 0 and solver.solution_cache is not None:
+        solver.solution_cache.set_state(cache_state)
+
+    has_gauss, cached_gaussian = state['rng_gauss']
+    np.random.set_state(('MT19937', state['rng_keys'], int(state['rng_position']), int(has_gauss), cached_gaussian))
+
+
+def _prefixed(prefix, state):
+    return {prefix + key: value for key, value in state.items()}
+
+
+def _unprefixed(prefix, state):
+    return {key[len(prefix):]: value for key, value in state.items() if key.startswith(prefix)}
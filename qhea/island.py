@@ -0,0 +1,112 @@
+import multiprocessing
+import numpy as np
+from .problem import QUBO
+from .parameters import Parameters
+from .recorder import Recorder
+from .solver import Qhea
+
+
+def _island(connection, qubo, parameters, local_optimizer, seed, qhea_kwargs):
+    '''
+    Process of one island, owns a Qhea instance and reacts to the commands of the IslandModel
+    '''
+    np.random.seed(seed) # own random stream per island
+    solver = Qhea(qubo, parameters, local_optimizer, **qhea_kwargs)
+
+    while True:
+        command, *args = connection.recv()
+        if command == 'evolve':
+            n_generations, n_migrants = args
+            solver.evolve(n_generations)
+            connection.send(solver.emigrants(n_migrants))
+        elif command == 'immigrate':
+            solver.immigrate(*args)
+        elif command == 'finish':
+            solver.close()
+            connection.send(solver.data)
+            connection.close()
+            return
+
+
+class IslandModel():
+    '''
+    Runs several Qhea populations (islands) in separate processes. Every migration_interval
+    generations the n_migrants fittest individuals of an island replace the least fit
+    individuals of its neighbours.
+    '''
+    topologies = ('ring', 'complete')
+
+    def __init__(self, qubo : QUBO, parameters : list[Parameters], local_optimizer = None, n_migrants : int = 1,
+                 migration_interval : int = 10, topology : str = 'ring', seed : int = None, **qhea_kwargs):
+        '''
+        :param qubo: qubo matrix to optimize (minimize)
+        :param parameters: one Parameter object per island
+        :param local_optimizer: optimizer for sub qubos, has to be picklable
+        :param n_migrants: number of individuals an island sends per migration
+        :param migration_interval: number of generations between two migrations
+        :param topology: 'ring', island i receives the migrants of island i - 1,
+                         'complete', island i receives the fittest n_migrants of all other islands
+        :param seed: seed from which the random streams of the islands are derived
+        :param qhea_kwargs: further keyword arguments for every Qhea instance
+        '''
+        if topology not in self.topologies:
+            raise ValueError(f'unknown topology {topology}, expected one of {self.topologies}')
+        self.qubo = qubo
+        self.parameters = parameters
+        self.local_optimizer = local_optimizer
+        self.n_migrants = n_migrants
+        self.migration_interval = migration_interval
+        self.topology = topology
+        self.seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(parameters))]
+        self.qhea_kwargs = qhea_kwargs
+
+
+    def optimize(self) -> Recorder:
+        '''
+        :return: combined evolution data, per generation the fittest individual over all islands
+        '''
+        connections, processes = [], []
+        for parameters, seed in zip(self.parameters, self.seeds):
+            connection, island_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_island, args=(island_connection, self.qubo, parameters,
+                                                                    self.local_optimizer, seed, self.qhea_kwargs))
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+
+        try:
+            remaining = [parameters.n_generations for parameters in self.parameters]
+            while max(remaining) > 0:
+                for i, connection in enumerate(connections):
+                    n_generations = min(self.migration_interval, remaining[i])
+                    connection.send(('evolve', n_generations, self.n_migrants))
+                    remaining[i] -= n_generations
+                emigrants = [connection.recv() for connection in connections]
+
+                if max(remaining) > 0:
+                    for i, connection in enumerate(connections):
+                        connection.send(('immigrate', *self._immigrants(i, emigrants)))
+
+            datas = []
+            for connection in connections:
+                connection.send(('finish',))
+                datas.append(connection.recv())
+        finally:
+            for process in processes:
+                process.join()
+
+        return self._combine(datas)
+
+
+    def _immigrants(self, island, emigrants):
+        if self.topology == 'ring':
+            return emigrants[island - 1]
+
+        chromosomes = np.vstack([emigrants[i][0] for i in range(len(emigrants)) if i != island])
+        fitness = np.concatenate([emigrants[i][1] for i in range(len(emigrants)) if i != island])
+        order = fitness.argsort(kind='stable')[:self.n_migrants]
+        return chromosomes[order], fitness[order]
+
+
+    def _combine(self, datas : list[Recorder]) -> Recorder:
+        return Recorder.combine(datas)
@@ -0,0 +1,53 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from util.worker import worker_state, init_worker
+
+
+def _optimize_chromosome(chromosome, order, seed):
+    '''
+    Local optimization of one chromosome inside a worker, sub problems are solved in the given order
+    '''
+    np.random.seed(seed)
+    qubo, models = worker_state['qubo'], worker_state['models']
+    for index in order:
+        sub_problem = qubo.get_sub_problem(index)
+        model = None if models is None else models[index]
+        solution, _ = sub_problem.solve(chromosome, worker_state['local_optimizer'], worker_state['warm_start'], model)
+        chromosome[sub_problem.d_vars_index] = solution
+    return chromosome
+
+
+class LocalOptimizationPool():
+    '''
+    Process pool for the local optimization of many chromosomes. Every worker receives the qubo
+    and the local optimizer once when it starts, tasks only carry a chromosome, a sub problem
+    order and a seed.
+    '''
+    def __init__(self, qubo, local_optimizer, n_workers : int = None, warm_start : bool = False, models : list = None):
+        '''
+        :param qubo: qubo the chromosomes belong to
+        :param local_optimizer: optimizer for sub qubos, has to be picklable (e.g. a module level function)
+        :param n_workers: number of processes, defaults to the number of cpus
+        :param warm_start: start the local optimizer from the current decision variables
+        :param models: optional persistent sampler model per sub problem, used instead of local_optimizer
+        '''
+        self._executor = ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                                             initargs=({'qubo': qubo, 'local_optimizer': local_optimizer,
+                                                        'warm_start': warm_start, 'models': models},))
+
+
+    def optimize(self, chromosomes, orders, seeds) -> list[np.ndarray]:
+        '''
+        :param chromosomes: chromosomes to optimize
+        :param orders: order of the sub problems per chromosome
+        :param seeds: seed of the global numpy random state per chromosome
+        :return: optimized chromosomes, in the order of the input
+        '''
+        futures = [self._executor.submit(_optimize_chromosome, chromosome, order, seed)
+                   for chromosome, order, seed in zip(chromosomes, orders, seeds)]
+        return [future.result() for future in futures]
+
+
+    def shutdown(self):
+        self._executor.shutdown()
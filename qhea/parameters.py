@@ -1,8 +1,10 @@
 class Parameters():
     '''Container for Qhea parameters'''
-    def __init__(self, optimiziation_rate, n_individuals, n_generations, selection_pressure, bias):
+    def __init__(self, optimiziation_rate, n_individuals, n_generations, selection_pressure, bias,
+                 incremental_evaluation=False):
         self.optimiziation_rate = optimiziation_rate
         self.n_individuals = n_individuals
         self.n_generations = n_generations
         self.selection_pressure = selection_pressure
-        self.bias = bias
\ No newline at end of file
+        self.bias = bias
+        self.incremental_evaluation = incremental_evaluation # score offspring by bit flips relative to a parent
\ No newline at end of file
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class Population():
+    '''
+    Population stored in preallocated arrays. The first n_individuals slots hold the
+    current population (sorted ascending by fitness), the remaining slots are reserved
+    for the offspring of one generation.
+    '''
+    def __init__(self, n_individuals : int, n_vars : int, fields : bool = False):
+        '''
+        :param n_individuals: size of the population
+        :param n_vars: length of a chromosome
+        :param fields: if True, a local field vector is kept per slot for incremental evaluation
+        '''
+        self.n_individuals = n_individuals
+        self.n_vars = n_vars
+        self.n_offspring = 2 * int(n_individuals / 2) # two offspring per pair of parents
+        self.chromosomes = np.zeros((n_individuals + self.n_offspring, n_vars), dtype=np.uint8)
+        self.fitness = np.zeros(n_individuals + self.n_offspring)
+        self.fields = np.zeros((n_individuals + self.n_offspring, n_vars)) if fields else None
+        # fields are computed on demand, has_field marks the slots with a valid field
+        self.has_field = np.zeros(n_individuals + self.n_offspring, dtype=bool) if fields else None
+
+
+    @property
+    def parents(self) -> np.ndarray:
+        return self.chromosomes[:self.n_individuals]
+
+    @property
+    def offspring(self) -> np.ndarray:
+        return self.chromosomes[self.n_individuals:]
+
+    @property
+    def offspring_fitness(self) -> np.ndarray:
+        return self.fitness[self.n_individuals:]
+
+    @property
+    def offspring_fields(self) -> np.ndarray:
+        return self.fields[self.n_individuals:]
+
+
+    def select(self, n_slots : int = None):
+        '''
+        Sorts the first n_slots individuals ascending by fitness and keeps
+        the n_individuals fittest in the parent slots
+        :param n_slots: number of used slots, defaults to parents + offspring
+        '''
+        if n_slots is None:
+            n_slots = len(self.fitness)
+        order = self.fitness[:n_slots].argsort(kind='stable')[:self.n_individuals]
+        self.chromosomes[:self.n_individuals] = self.chromosomes[order]
+        self.fitness[:self.n_individuals] = self.fitness[order]
+        if self.fields is not None:
+            self.fields[:self.n_individuals] = self.fields[order]
+            self.has_field[:self.n_individuals] = self.has_field[order]
+
+
+    def individual(self, index : int) -> np.ndarray:
+        '''Returns a copy of an individual as [fitness, chromosome]'''
+        return np.array([self.fitness[index], self.chromosomes[index].copy()], dtype=object)
@@ -4,38 +4,69 @@ import scipy.sparse
 
 class SubProblem():
     
-
-    def __init__(self, q_mat, d_vars_index, f_vars_index) -> None:
+    def __init__(self, q_mat, d_vars_index, f_vars_index, q_mat_t = None) -> None:
+        '''
+        :param q_mat: qubo matrix, dense or scipy.sparse
+        :param d_vars_index: indices of the decision variables
+        :param f_vars_index: indices of the frozen variables
+        :param q_mat_t: transposed qubo matrix as CSR, computed if not given
+        '''
 
         self.d_vars_index = d_vars_index
         self.f_vars_index = f_vars_index
 
+        q_mat = scipy.sparse.csr_array(q_mat)
+        if q_mat_t is None:
+            q_mat_t = scipy.sparse.csr_array(q_mat.T)
+
         self.base = self.base(q_mat)
-        self.sum_rows_cols = self.sum_rows_cols(q_mat)
+        self.sum_rows_cols = self.sum_rows_cols(q_mat, q_mat_t)
 
     
     def base(self,q_mat) -> np.ndarray:
-        base = q_mat[self.d_vars_index]
-        base = base.T[self.d_vars_index]
-        base = base.T
-        return base
+        # the k x k block is the only part handed to the annealer, so it is the only dense part
+        base = q_mat[self.d_vars_index][:, self.d_vars_index]
+        return base.toarray()
 
-    def sum_rows_cols(self, q_mat : np.ndarray) -> np.ndarray:
-        frozen_rows = q_mat.T[self.f_vars_index].T[self.d_vars_index]
-        frozen_cols = q_mat.T[self.d_vars_index].T[self.f_vars_index].T
+    def sum_rows_cols(self, q_mat, q_mat_t) -> scipy.sparse.csr_array:
+        # rows of the decision variables restricted to the frozen columns, and the frozen rows
+        # restricted to the decision columns, taken as rows of the transposed matrix
+        frozen_rows = q_mat[self.d_vars_index][:, self.f_vars_index]
+        frozen_cols = q_mat_t[self.d_vars_index][:, self.f_vars_index]
 
         sum_frozen = frozen_rows + frozen_cols
 
-        return sum_frozen  
+        return scipy.sparse.csr_array(sum_frozen)
 
 
-    def get_qubo(self, x : np.ndarray) -> (np.ndarray, np.ndarray):
+    def get_linear(self, x : np.ndarray) -> np.ndarray:
+        '''
+        :return: linear term of the sub qubo, the couplings of the decision variables with the frozen variables of x
+        '''
         f_vars = x[self.f_vars_index]
-        f_obj = self.sum_rows_cols @ f_vars
+        return self.sum_rows_cols @ f_vars
+
+
+    def get_qubo(self, x : np.ndarray) -> (np.ndarray, np.ndarray):
+        f_obj = self.get_linear(x)
         sub_qubo = self.base + np.diag(f_obj)
 
         return sub_qubo, self.d_vars_index
 
+
+    def solve(self, x : np.ndarray, local_optimizer = None, warm_start : bool = False, model = None) -> (np.ndarray, float):
+        '''
+        Solves the sub qubo of x, with the persistent model if one is given, otherwise with local_optimizer
+        :param warm_start: if True, the current decision variables of x are passed as initial_state
+        :param model: optional persistent sampler model of this sub problem, see QUBO.prepare_models
+        :return: solution for the decision variables and its objective value
+        '''
+        kwargs = {'initial_state': x[self.d_vars_index]} if warm_start else {}
+        if model is not None:
+            return model.sample(self.get_linear(x), **kwargs)
+        sub_qubo, _ = self.get_qubo(x)
+        return local_optimizer(sub_qubo, **kwargs)
+
         
 
 
@@ -45,36 +76,142 @@ class QUBO():
 
     n_sub_problems = 0
     sub_problem_size = 0
-    _sub_problems : list[SubProblem] = []
+    _sub_problems : list[SubProblem] = None
 
 
 
     _sparse_q_mat = None
+    _linear = None
+    _coupling = None
+    # offspring differing from their parent in more than this fraction of the bits are evaluated in full,
+    # beyond it the sparse product of the flips costs more than a full local field
+    incremental_fraction = 0.005
 
     
 
 
-    def __init__(self,q_mat : np.ndarray, sub_problem_size : int) -> None:
+    def __init__(self,q_mat, sub_problem_size : int) -> None:
+        '''
+        :param q_mat: qubo matrix, dense or scipy.sparse
+        :param sub_problem_size: number of decision variables per sub problem
+        '''
 
-        self.n_vars = len(q_mat)
+        q_mat = scipy.sparse.csr_array(q_mat)
+        self.n_vars = q_mat.shape[0]
         
         self.n_sub_problems = int(self.n_vars / sub_problem_size)
         self.sub_problem_size = sub_problem_size
         
         self._prepare_sub_problems(q_mat)
 
-        self._sparse_q_mat = scipy.sparse.coo_array(np.triu(q_mat))
+        self._sparse_q_mat = scipy.sparse.csr_array(scipy.sparse.triu(q_mat))
+        self._prepare_coupling()
 
     
     def objective_function(self,x) -> float:
         return x @ self._sparse_q_mat @ x
     
+
+    def evaluate_batch(self, X : np.ndarray) -> np.ndarray:
+        '''
+        Objective value for every row of X with one sparse product
+        :param X: matrix of chromosomes, one per row
+        :return: vector of objective values
+        '''
+        QX = self._sparse_q_mat @ X.T
+        return np.einsum('ij,ji->i', X, QX)
+    
     
+    def local_field(self, x : np.ndarray) -> np.ndarray:
+        '''
+        Local field h = A x, where A is the symmetric coupling matrix (off diagonal
+        entries of the upper triangular matrix mirrored, zero diagonal)
+        :param x: chromosome, or a matrix with one chromosome per row
+        :return: local field(s) with the same shape as x
+        '''
+        if np.ndim(x) == 2:
+            return (self._coupling @ x.T).T
+        return self._coupling @ x
+    
+
+    def evaluate_fields(self, X : np.ndarray) -> (np.ndarray, np.ndarray):
+        '''
+        Objective values and local fields of the rows of X, the objective is derived from the field
+        as x @ linear + x @ h / 2, so only one sparse product is needed
+        :param X: matrix of chromosomes, one per row
+        :return: vector of objective values and the local fields, one per row
+        '''
+        fields = self.local_field(X)
+        return X @ self._linear + 0.5 * np.einsum('ij,ij->i', X, fields), fields
+
+
+    def flip_delta(self, x : np.ndarray, field : np.ndarray, index : np.ndarray) -> float:
+        '''
+        Energy change of flipping the bits at index, computed in O(sum of their degrees).
+        The field is updated in place to the flipped state, x is left untouched and
+        has to be flipped by the caller.
+        :param x: chromosome before the flip
+        :param field: local field of x, see local_field
+        :param index: indices of the bits to flip
+        :return: objective value after the flip minus the value before
+        '''
+        index = np.asarray(index)
+        if len(index) == 0:
+            return 0.0
+        s = 1.0 - 2.0 * x[index] # +1 for 0 -> 1, -1 for 1 -> 0
+        columns = self._coupling_columns(index)
+        delta = s @ (self._linear[index] + field[index]) + 0.5 * (s @ (columns[index] @ s))
+        field += columns @ s
+        return delta
+    
+
+    def flip_deltas(self, X : np.ndarray, fields : np.ndarray, flips : np.ndarray) -> np.ndarray:
+        '''
+        Batch version of flip_delta for one bit flip pattern per row. The flips of all rows form one sparse
+        matrix S of +-1 entries, the field changes are the sparse product S A, so the cost scales with the
+        total number of flips times the degree of the flipped variables.
+        :param X: chromosomes before the flips, one per row
+        :param fields: local fields of the rows of X, updated in place to the flipped states
+        :param flips: boolean matrix of the shape of X, True where a bit is flipped
+        :return: vector of objective value changes, one per row
+        '''
+        rows, index = np.nonzero(flips)
+        if len(rows) == 0:
+            return np.zeros(len(X))
+        s = 1.0 - 2.0 * X[rows, index] # +1 for 0 -> 1, -1 for 1 -> 0
+        variables, position = np.unique(index, return_inverse=True)
+
+        # A is symmetric, row r of S A = S[r, variables] A[variables]; the rows of A are the columns of the csc slice
+        flipped = scipy.sparse.csr_array((s, (rows, position)), shape=(len(X), len(variables)))
+        change = flipped @ self._coupling_columns(variables).T
+        signs = scipy.sparse.csr_array((s, (rows, index)), shape=X.shape)
+
+        deltas = np.bincount(rows, s * (self._linear[index] + fields[rows, index]), minlength=len(X))
+        deltas += 0.5 * np.asarray(signs.multiply(change).sum(axis=1)).ravel()
+
+        # a sparse product has no duplicate entries, the field changes are scattered directly
+        change_rows = np.repeat(np.arange(len(X)), np.diff(change.indptr))
+        fields[change_rows, change.indices] += change.data
+        return deltas
+
+
     def get_sub_problem(self, index) -> SubProblem:
         return self._sub_problems[index]
     
 
+    def prepare_models(self, model_factory) -> list:
+        '''
+        Builds a persistent sampler model per sub problem from its constant part, afterwards only
+        the linear term is pushed to the model for every solve, see SubProblem.solve
+        :param model_factory: callable (base) -> model, model.sample(linear) -> (solution_vec, objective_val)
+        :return: one model per sub problem
+        '''
+        return [model_factory(self.get_sub_problem(index).base) for index in range(self.n_sub_problems)]
+    
+
     def _prepare_sub_problems(self, q_mat):
+        self._sub_problems = []
+        q_mat_t = scipy.sparse.csr_array(q_mat.T)
         
         for i in range(self.n_sub_problems):
             d_vars_index = np.arange(i * self.sub_problem_size, i * self.sub_problem_size + self.sub_problem_size)
@@ -82,10 +219,22 @@ class QUBO():
             f_vars[d_vars_index] = 0
             f_vars_index = np.where(f_vars == 1)[0]
 
-            sub_problem = SubProblem(q_mat, d_vars_index, f_vars_index)
+            sub_problem = SubProblem(q_mat, d_vars_index, f_vars_index, q_mat_t)
             self._sub_problems.append(sub_problem) 
 
 
+    def _prepare_coupling(self):
+        self._linear = self._sparse_q_mat.diagonal()
+        coupling = (self._sparse_q_mat + self._sparse_q_mat.T).tocsc()
+        coupling.setdiag(0)
+        coupling.eliminate_zeros()
+        self._coupling = coupling
+
+
+    def _coupling_columns(self, index) -> scipy.sparse.csc_array:
+        return self._coupling[:, index]
+
+
 
 
     # Method to override
@@ -102,30 +251,165 @@ class TSPQUBO(QUBO):
         super().__init__(q_mat, sub_problem_size)
 
     
-    def _generate_q_mat(self, penalty) -> np.ndarray:
+    def _generate_q_mat(self, penalty) -> scipy.sparse.csr_array:
         n_nodes = len(self.d_mat)
-        constraint_matrix = np.zeros((n_nodes ** 2, n_nodes ** 2))
-        dimension = len(constraint_matrix)
+        identity = scipy.sparse.csr_array(scipy.sparse.identity(n_nodes))
+        ones = scipy.sparse.csr_array(np.ones((n_nodes, n_nodes)))
 
-        for i in range(dimension):
-            for j in range(dimension):
+        # +penalty for two variables in the same row (kron(identity, ones)) or the same column (kron(ones, identity)),
+        # both terms add up to 2 * penalty on the main diagonal, which has to be -2 * penalty
+        constraint_matrix = penalty * (scipy.sparse.kron(identity, ones, format='csr') + scipy.sparse.kron(ones, identity, format='csr')) \
+            - 4 * penalty * scipy.sparse.identity(n_nodes ** 2, format='csr')
 
-                if i == j:
-                    constraint_matrix[i][j] -= 2 * penalty
-                else:
-                    if int(j / n_nodes) == int(i / n_nodes) or j % n_nodes == i % n_nodes:
-                        constraint_matrix[i][j] += 1 * penalty
+        # cyclic shift, the node at position t is connected to the node at position t + 1
+        positions = np.arange(n_nodes)
+        amp = scipy.sparse.csr_array((np.ones(n_nodes), (positions, (positions + 1) % n_nodes)), shape=(n_nodes, n_nodes))
+        objective = scipy.sparse.kron(amp, scipy.sparse.csr_array(np.asarray(self.d_mat, dtype=float)), format='csr')
 
-        
-        amp = np.zeros((n_nodes, n_nodes))
-        for i in range(len(amp)):
-            amp[i][(i + 1) % n_nodes] = 1
-        objective = np.kron(amp, self.d_mat)
-        q_mat = objective + constraint_matrix
+        q_mat = scipy.sparse.csr_array(objective + constraint_matrix)
+        q_mat.eliminate_zeros()
         return q_mat
 
-    
 
 
+class StructuredSubProblem(SubProblem):
+    '''Sub problem of a StructuredTSPQUBO, the couplings are derived from the distance matrix'''
+
+    def __init__(self, qubo, d_vars_index) -> None:
+        '''
+        :param qubo: StructuredTSPQUBO the sub problem belongs to
+        :param d_vars_index: indices of the decision variables
+        '''
+        self.qubo = qubo
+        self.d_vars_index = d_vars_index
+        self.rows = np.unique(d_vars_index // qubo.n_nodes) # tour positions touched by the sub problem
+
+        self.base = qubo.q_block(d_vars_index, d_vars_index)
+        self.sum_base = self.base + self.base.T
+
 
-    
\ No newline at end of file
+    def get_linear(self, x : np.ndarray) -> np.ndarray:
+        n = self.qubo.n_nodes
+        # couplings of the decision variables with all variables, minus the
+        # couplings inside the block, which remain quadratic in the sub qubo
+        f_obj = self.qubo.symmetric_product(x, self.rows).ravel()
+        return f_obj[self.d_vars_index - self.rows[0] * n] - self.sum_base @ x[self.d_vars_index]
+
+
+
+class StructuredTSPQUBO(QUBO):
+    '''
+    Matrix free variant of TSPQUBO. Objective values, local fields and sub qubos are computed
+    from the distance matrix and the penalty, the n^2 x n^2 qubo matrix is never materialized.
+    Index i of a chromosome is the node i % n_nodes at tour position i // n_nodes.
+    '''
+    incremental_fraction = None # the matrix free objective is cheaper than any flip update, see Qhea
+
+    def __init__(self, d_mat, sub_problem_size: int, penalty : float) -> None:
+        self.d_mat = np.asarray(d_mat, dtype=float)
+        self.penalty = penalty
+        self.n_nodes = len(self.d_mat)
+        self.n_vars = self.n_nodes ** 2
+
+        self.n_sub_problems = int(self.n_vars / sub_problem_size)
+        self.sub_problem_size = sub_problem_size
+        self._sub_problems = {}
+
+        self._linear = np.full(self.n_vars, -2.0 * penalty)
+
+
+    def objective_function(self, x) -> float:
+        return self.evaluate_batch(np.reshape(x, (1, self.n_vars)))[0]
+
+
+    def evaluate_batch(self, X : np.ndarray) -> np.ndarray:
+        '''
+        Objective value for every row of X, equal to x @ triu(q_mat) @ x of TSPQUBO
+        :param X: matrix of chromosomes, one per row
+        :return: vector of objective values
+        '''
+        X = np.reshape(X, (-1, self.n_nodes, self.n_nodes)).astype(float)
+        rows = X.sum(axis=2)
+        cols = X.sum(axis=1)
+
+        # main diagonal, plus one penalty for every pair of variables in the same row or column
+        constraint = -2 * self.penalty * rows.sum(axis=1) \
+            + self.penalty * ((rows * (rows - 1)).sum(axis=1) + (cols * (cols - 1)).sum(axis=1)) / 2
+        # tour from position t to t + 1, the edge back to the first position lies in the lower triangle
+        tour = ((X[:, :-1] @ self.d_mat) * X[:, 1:]).sum(axis=(1, 2))
+        return constraint + tour
+
+
+    def local_field(self, x : np.ndarray) -> np.ndarray:
+        n = self.n_nodes
+        X = np.reshape(x, (-1, n, n)).astype(float)
+        rows = X.sum(axis=2, keepdims=True)
+        cols = X.sum(axis=1, keepdims=True)
+
+        field = self.penalty * (rows + cols - 2 * X)
+        field[:, :-1] += X[:, 1:] @ self.d_mat.T # coupling to the next position
+        field[:, 1:] += X[:, :-1] @ self.d_mat # coupling to the previous position
+        return np.reshape(field, np.shape(x))
+
+
+    def _coupling_columns(self, index) -> scipy.sparse.csc_array:
+        n = self.n_nodes
+        index = np.asarray(index)
+        positions, nodes = np.divmod(index, n)
+        all_nodes = np.arange(n)
+        columns = np.arange(len(index))
+
+        rows = [(positions[:, None] * n + all_nodes).ravel(), # same row
+                (all_nodes * n + nodes[:, None]).ravel(), # same column
+                index] # the variable itself is in both, remove it again
+        cols = [np.repeat(columns, n), np.repeat(columns, n), columns]
+        vals = [np.full(len(index) * n, self.penalty), np.full(len(index) * n, self.penalty),
+                np.full(len(index), -2.0 * self.penalty)]
+
+        has_next = positions < n - 1
+        rows.append(((positions[has_next, None] + 1) * n + all_nodes).ravel())
+        cols.append(np.repeat(columns[has_next], n))
+        vals.append(self.d_mat[nodes[has_next]].ravel())
+
+        has_previous = positions > 0
+        rows.append(((positions[has_previous, None] - 1) * n + all_nodes).ravel())
+        cols.append(np.repeat(columns[has_previous], n))
+        vals.append(self.d_mat[:, nodes[has_previous]].T.ravel())
+
+        coupling = scipy.sparse.coo_array((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                          shape=(self.n_vars, len(index)))
+        return scipy.sparse.csc_array(coupling)
+
+
+    def q_block(self, rows : np.ndarray, cols : np.ndarray) -> np.ndarray:
+        '''
+        Dense block q_mat[rows][:, cols] of the full (not triangular) TSPQUBO matrix
+        '''
+        n = self.n_nodes
+        row_positions, row_nodes = np.divmod(rows, n)
+        col_positions, col_nodes = np.divmod(cols, n)
+
+        block = self.penalty * ((row_positions[:, None] == col_positions) | (row_nodes[:, None] == col_nodes)).astype(float)
+        block -= 3 * self.penalty * (rows[:, None] == cols) # main diagonal is -2 * penalty
+        block += ((row_positions[:, None] + 1) % n == col_positions) * self.d_mat[np.ix_(row_nodes, col_nodes)]
+        return block
+
+
+    def symmetric_product(self, x : np.ndarray, positions : np.ndarray) -> np.ndarray:
+        '''
+        Rows of (q_mat + q_mat.T) @ x for the given tour positions, as a matrix of shape (len(positions), n_nodes)
+        '''
+        X = np.reshape(x, (self.n_nodes, self.n_nodes)).astype(float)
+        rows = X[positions].sum(axis=1, keepdims=True)
+        cols = X.sum(axis=0)
+
+        constraint = -2 * self.penalty * X[positions] + self.penalty * (rows + cols - 2 * X[positions])
+        tour = X[(positions + 1) % self.n_nodes] @ self.d_mat.T + X[(positions - 1) % self.n_nodes] @ self.d_mat
+        return 2 * constraint + tour
+
+
+    def get_sub_problem(self, index) -> StructuredSubProblem:
+        if index not in self._sub_problems:
+            d_vars_index = np.arange(index * self.sub_problem_size, index * self.sub_problem_size + self.sub_problem_size)
+            self._sub_problems[index] = StructuredSubProblem(self, d_vars_index)
+        return self._sub_problems[index]
@@ -0,0 +1,195 @@
+import numpy as np
+
+
+class Recorder():
+    '''
+    Collects the data of a run. The fitness of the fittest individual is stored per generation in a
+    preallocated array that doubles when full, chromosomes only as snapshots: whenever the all time
+    fittest improves and, optionally, every snapshot_interval generations. Fitness values and snapshots
+    can be spilled to memory mapped files.
+    '''
+    fitness = 0 # variable used to index individual for fitness
+    value = 1 # variable used to index individual for value, eg. chromosome
+    def __init__(self, snapshot_interval : int = None, spill_path : str = None, capacity : int = 1024, sink = None):
+        '''
+        :param snapshot_interval: if set, the fittest chromosome is also stored every snapshot_interval generations
+        :param spill_path: if set, fitness values and snapshots are kept in the memory mapped files
+                           spill_path + '.fitness' and spill_path + '.snapshots'
+        :param capacity: initial number of generations (and snapshots) the arrays can hold
+        :param sink: optional stream of the records, write(generation, fitness) is called per generation,
+                     e.g. json_db.LogWriter
+        '''
+        self.snapshot_interval = snapshot_interval
+        self.spill_path = spill_path
+        self.sink = sink
+        self.n_generations = 0
+        self.n_snapshots = 0
+        self.all_time_fittest = None
+        self._fitness = self._allocate('.fitness', (capacity,), float)
+        self._snapshot_generations = np.empty(capacity, dtype=np.int64)
+        self._snapshots = None # allocated with the first chromosome
+
+
+    def add_individual(self, individual):
+        '''
+        :param individual: object array [fitness, chromosome], see Population.individual
+        '''
+        self.record(individual[self.fitness], individual[self.value])
+
+
+    def record(self, fitness : float, chromosome : np.ndarray):
+        '''
+        Records the fittest individual of the next generation
+        '''
+        generation = self.n_generations
+        if generation == len(self._fitness):
+            self._fitness = self._allocate('.fitness', (2 * generation,), float, self._fitness)
+        self._fitness[generation] = fitness
+        self.n_generations += 1
+        if self.sink is not None:
+            self.sink.write(generation, fitness)
+
+        improved = self.all_time_fittest is None or self.all_time_fittest[self.fitness] > fitness
+        if improved:
+            self.all_time_fittest = _individual(fitness, chromosome)
+        if improved or (self.snapshot_interval is not None and generation % self.snapshot_interval == 0):
+            self._snapshot(generation, chromosome)
+
+
+    def _snapshot(self, generation, chromosome):
+        k = self.n_snapshots
+        if self._snapshots is None:
+            self._snapshots = self._allocate('.snapshots', (len(self._snapshot_generations), len(chromosome)),
+                                             np.asarray(chromosome).dtype)
+        elif k == len(self._snapshots):
+            self._snapshots = self._allocate('.snapshots', (2 * k, self._snapshots.shape[1]), self._snapshots.dtype,
+                                             self._snapshots)
+        if k == len(self._snapshot_generations):
+            self._snapshot_generations = np.concatenate([self._snapshot_generations, np.empty_like(self._snapshot_generations)])
+        self._snapshot_generations[k] = generation
+        self._snapshots[k] = chromosome
+        self.n_snapshots += 1
+
+
+    def _allocate(self, suffix, shape, dtype, old=None):
+        '''
+        :return: array of the given shape, in memory or memory mapped, the entries of old are kept
+        '''
+        if self.spill_path is None:
+            array = np.empty(shape, dtype=dtype)
+            if old is not None:
+                array[:len(old)] = old
+            return array
+
+        if old is not None:
+            old.flush() # the file is extended in place, old entries stay where they are
+        return np.memmap(self.spill_path + suffix, dtype=dtype, shape=shape, mode='w+' if old is None else 'r+')
+
+
+    def get_fitness_evolution(self) -> np.ndarray:
+        return self._fitness[:self.n_generations]
+
+
+    def get_solution(self):
+        '''
+        :return: all time fittest individual, object array [fitness, chromosome]
+        '''
+        return self.all_time_fittest
+
+
+    def get_snapshots(self):
+        '''
+        :return: generations of the snapshots and the snapshot chromosomes, one per row
+        '''
+        if self._snapshots is None:
+            return self._snapshot_generations[:0], np.empty((0, 0))
+        return self._snapshot_generations[:self.n_snapshots], self._snapshots[:self.n_snapshots]
+
+
+    def chromosome_at(self, generation : int) -> np.ndarray:
+        '''
+        :return: chromosome of the last snapshot at or before generation, the fittest chromosome of that
+                 generation unless an equally fit but different chromosome replaced it
+        '''
+        generations, snapshots = self.get_snapshots()
+        return snapshots[np.searchsorted(generations, generation, side='right') - 1]
+
+
+    def get_individual_evolution(self):
+        return np.array([self.chromosome_at(generation) for generation in range(self.n_generations)])
+
+
+    def get_evolution(self):
+        '''
+        :return: object array with one individual [fitness, chromosome] per generation, built from the snapshots
+        '''
+        evolution = np.empty((self.n_generations, 2), dtype=object)
+        evolution[:, self.fitness] = self.get_fitness_evolution()
+        for generation in range(self.n_generations):
+            evolution[generation, self.value] = self.chromosome_at(generation)
+        return evolution
+
+
+    def get_state(self) -> dict:
+        '''
+        :return: arrays describing the recorded data, see set_state
+        '''
+        generations, snapshots = self.get_snapshots()
+        state = {'fitness': self.get_fitness_evolution(), 'snapshot_generations': generations, 'snapshots': snapshots}
+        if self.all_time_fittest is not None:
+            state['best_fitness'] = np.float64(self.all_time_fittest[self.fitness])
+            state['best_chromosome'] = self.all_time_fittest[self.value]
+        return state
+
+
+    def set_state(self, state : dict):
+        '''
+        Replaces the recorded data, a sink that supports truncate is cut back to the restored generations
+        '''
+        fitness = np.asarray(state['fitness'])
+        self.n_generations = len(fitness)
+        self._fitness = self._allocate('.fitness', (max(self.n_generations, len(self._fitness)),), float)
+        self._fitness[:self.n_generations] = fitness
+
+        generations = np.asarray(state['snapshot_generations'])
+        self.n_snapshots = len(generations)
+        capacity = max(self.n_snapshots, len(self._snapshot_generations))
+        self._snapshot_generations = np.empty(capacity, dtype=np.int64)
+        self._snapshot_generations[:self.n_snapshots] = generations
+        self._snapshots = None
+        if self.n_snapshots > 0:
+            snapshots = np.asarray(state['snapshots'])
+            self._snapshots = self._allocate('.snapshots', (capacity, snapshots.shape[1]), snapshots.dtype)
+            self._snapshots[:self.n_snapshots] = snapshots
+
+        self.all_time_fittest = None
+        if 'best_fitness' in state:
+            self.all_time_fittest = _individual(state['best_fitness'].item(), state['best_chromosome'])
+        if self.sink is not None and hasattr(self.sink, 'truncate'):
+            self.sink.truncate(self.n_generations)
+
+
+    @classmethod
+    def combine(cls, recorders : list, **kwargs):
+        '''
+        Per generation the fittest individual over all recorders, recorders with fewer generations
+        contribute their last individual
+        :param kwargs: arguments of the combined recorder
+        '''
+        n_generations = max(recorder.n_generations for recorder in recorders)
+        fitness = np.vstack([np.pad(recorder.get_fitness_evolution(), (0, n_generations - recorder.n_generations),
+                                    mode='edge') for recorder in recorders])
+        owners = fitness.argmin(axis=0)
+
+        combined = cls(**kwargs)
+        for generation, owner in enumerate(owners):
+            recorder = recorders[owner]
+            combined.record(fitness[owner, generation], recorder.chromosome_at(min(generation, recorder.n_generations - 1)))
+        return combined
+
+
+def _individual(fitness, chromosome):
+    individual = np.empty(2, dtype=object)
+    individual[Recorder.fitness] = fitness
+    individual[Recorder.value] = np.array(chromosome)
+    return individual
@@ -1,42 +1,121 @@
+import time
 import numpy as np
 from .problem import QUBO
 from .parameters import Parameters
-from .data import Data
+from .recorder import Recorder
+from .population import Population
+from .cache import SolutionCache
+from .parallel import LocalOptimizationPool
+from .stopping import StoppingCriteria
+from .checkpoint import save_checkpoint, load_checkpoint, restore_checkpoint, get_parameters
 
 class Qhea():
     fitness = 0 # variable used to index individual for fitness
     value = 1 # variable used to index individual for value, eg. chromosome
-    def __init__(self, qubo : QUBO, parameters : Parameters, local_optimizer = None):
+    def __init__(self, qubo : QUBO, parameters : Parameters, local_optimizer = None, solution_cache : SolutionCache = None,
+                 n_workers : int = None, local_model = None, batch_optimizer = None, warm_start : bool = False,
+                 recorder : Recorder = None, checkpoint_path : str = None, checkpoint_interval : float = 60,
+                 stopping : StoppingCriteria = None, callback = None):
         '''
         :param qubo: qubo matrix  to optimize (minimize)
         :param parameters: Parameter oject with params to execute the algorithm
+        :param local_optimizer: optimizer for sub qubos, interface is (q_mat) -> (solution_vec, objective_val)
+        :param solution_cache: optional cache of sub problem solutions, avoids repeated local_optimizer calls
+        :param n_workers: if set, the local optimization of a generation runs on a pool of n_workers processes,
+                          the pool is started with the first generation and kept until close (or the end of optimize)
+                          (the solution cache is not used by the workers)
+        :param local_model: optional factory (base) -> model, builds one persistent sampler model per sub problem
+                            which only receives the linear term, used instead of local_optimizer
+        :param batch_optimizer: optional optimizer for a stack of sub qubos, interface is
+                                (q_mats) -> (solution_vecs, objective_vals), e.g. annealing.classic.anneal_batch.
+                                If given, the local optimization of a generation is solved in one call per sub problem step
+        :param warm_start: if True, the optimizers start from the current decision variables of the chromosome,
+                           passed as initial_state (initial_states for the batch optimizer), e.g. annealing.tabu_search
+        :param recorder: optional empty Recorder, e.g. with snapshot_interval or spill_path, a default Recorder if not given
+        :param checkpoint_path: if set, the state of the run is written to this file every checkpoint_interval
+                                seconds and when evolve returns, see Qhea.resume
+        :param checkpoint_interval: minimal number of seconds between two checkpoints
+        :param stopping: optional StoppingCriteria, the run ends before n_generations once a criterion is met
+        :param callback: optional function (solver) -> bool called after every generation, returning True stops the run
         '''
         self.qubo = qubo # save qubo
         self.local_optimizer = local_optimizer
+        self.solution_cache = solution_cache
+        self.n_workers = n_workers
+        self._pool = None
+        self.local_model = local_model
+        self.batch_optimizer = batch_optimizer
+        self.warm_start = warm_start
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = time.monotonic()
+        self.stopping = stopping
+        self.callback = callback
+        self.stop_reason = None # criterion that ended the last run, None if the generations ran out
+        self.elapsed_time = 0.0 # seconds spent evolving
+        self.n_evaluations = 0 # fitness evaluations
+        self.n_annealer_calls = 0 # sub qubos solved by the local optimizer
+        self.models = None if local_model is None else self.qubo.prepare_models(local_model)
+        self.parameters = parameters
         self.n_individuals = parameters.n_individuals # size of the population
         self.n_generations = parameters.n_generations # number of generations 
         self.mutation_rate = 0
+        self.generation = 0 # number of generations done so far
         self.optimization_rate = parameters.optimiziation_rate # probability of local_optimiztaion
         self.selection_pressure = parameters.selection_pressure
         self.bias = parameters.bias
+        self.incremental_evaluation = parameters.incremental_evaluation
+        if self.incremental_evaluation and qubo.incremental_fraction is None:
+            raise ValueError(f'{type(qubo).__name__} does not support incremental_evaluation')
         self.population = self._init_population()
-        self.data = self._init_data() 
+        self.data = self._init_data(recorder)
         self.probabilities_cumsum =self._init_probabilities_cum_sum() # init data
+        self.best_fitness = self.population.fitness[0]
+        self.last_improvement = 0 # generation in which the best fitness was reached
         
     
+    @classmethod
+    def resume(cls, path : str, qubo : QUBO, local_optimizer = None, **kwargs):
+        '''
+        Continues a run from a checkpoint written by Qhea.checkpoint. The population, generation counter,
+        recorder, solution cache and the global numpy random state are restored, so with the same qubo and
+        optimizers the run continues exactly as without interruption.
+        :param path: checkpoint file
+        :param qubo: qubo of the run
+        :param kwargs: further arguments of Qhea, e.g. a Recorder whose sink continues the log of the run,
+                       the parameters are taken from the checkpoint
+        '''
+        state = load_checkpoint(path)
+        kwargs.setdefault('checkpoint_path', path)
+        if any(key.startswith('cache_') for key in state) and kwargs.get('solution_cache') is None:
+            raise ValueError(f'{path} holds a solution cache, pass a SolutionCache to resume from it')
+        solver = cls(qubo, Parameters(**get_parameters(state)), local_optimizer, **kwargs)
+        restore_checkpoint(solver, state)
+        return solver
+
+
+    def checkpoint(self, path : str = None):
+        '''
+        Writes the state of the run, see qhea.checkpoint
+        :param path: defaults to checkpoint_path
+        '''
+        save_checkpoint(self.checkpoint_path if path is None else path, self)
+        self._last_checkpoint = time.monotonic()
+
+
     def _init_population(self):
-        population = np.array([[0, np.random.randint(0, 2, self.qubo.n_vars)] for j in range(self.n_individuals)],
-                      dtype=object) # init population
-        
-        for ind in range(self.n_individuals):
-            population[ind][self.fitness] = self.qubo.objective_function(population[ind][self.value]) # initial fitness to population
-        
-        population = population[population[:, self.fitness].argsort()] # sort ascending by fitness
+        population = Population(self.n_individuals, self.qubo.n_vars, fields=self.incremental_evaluation)
+        population.parents[:] = np.random.randint(0, 2, (self.n_individuals, self.qubo.n_vars)) # init population
+        population.fitness[:self.n_individuals] = self.qubo.evaluate_batch(population.parents) # initial fitness to population
+        self.n_evaluations += self.n_individuals
+
+        population.select(self.n_individuals) # sort ascending by fitness
         return population
 
 
-    def _init_data(self):
-        execution_data = Data(self.population[0])
+    def _init_data(self, recorder):
+        execution_data = Recorder() if recorder is None else recorder
+        execution_data.add_individual(self.population.individual(0))
         return execution_data
     
     def _init_probabilities_cum_sum(self):
@@ -50,85 +129,358 @@ class Qhea():
 
    
     
-    def local_optimization(self, chromosome):
+    def local_optimization(self, chromosome, field = None):
+        '''
+        Optimizes the sub problems of the chromosome in place with probability optimization_rate
+        :param chromosome: chromosome to optimize
+        :param field: local field of the chromosome, if given it is updated in place and the
+                      energy change is tracked by bit flips
+        :return: chromosome and energy change (None if no field is given)
+        '''
+        delta = None if field is None else 0.0
         r = np.random.uniform(0,1)
         if r < self.optimization_rate:
             order =  np.random.permutation(self.qubo.n_sub_problems)
             for index in order:
                 sub_problem = self.qubo.get_sub_problem(index)
-                sub_qubo, d_vars_index = sub_problem.get_qubo(chromosome) 
-                solution, _ = self.local_optimizer(sub_qubo)
+                d_vars_index = sub_problem.d_vars_index
+                solution = self._solve_sub_problem(index, sub_problem, chromosome)
+                if field is not None:
+                    flips = d_vars_index[chromosome[d_vars_index] != solution]
+                    delta += self.qubo.flip_delta(chromosome, field, flips)
                 chromosome[d_vars_index] = solution
-        return chromosome
+        return chromosome, delta
+
+
+    def _local_search(self) -> bool:
+        return self.local_optimizer is not None or self.local_model is not None or self.batch_optimizer is not None
+
+
+    def _select_for_local_optimization(self):
+        '''
+        Draws in slot order which offspring are optimized, with their sub problem order and a seed
+        :return: selected slots, sub problem orders, seeds
+        '''
+        selected, orders, seeds = [], [], []
+        for slot in range(self.population.n_offspring):
+            r = np.random.uniform(0,1)
+            if r < self.optimization_rate:
+                selected.append(slot)
+                orders.append(np.random.permutation(self.qubo.n_sub_problems))
+                seeds.append(np.random.randint(0, 2**31 - 1))
+        return selected, orders, seeds
+
+
+    def _batch_local_optimization(self):
+        '''
+        Local optimization of all selected offspring of a generation. In every step each selected
+        offspring contributes the sub qubo of the next sub problem in its order, the stack of sub
+        qubos is solved with one call of the batch optimizer.
+        '''
+        offspring = self.population.offspring
+        selected, orders, _ = self._select_for_local_optimization()
+
+        for step in range(self.qubo.n_sub_problems):
+            pending, sub_qubos, initial_states = [], [], []
+            for slot, order in zip(selected, orders):
+                index = order[step]
+                sub_problem = self.qubo.get_sub_problem(index)
+                if self.solution_cache is not None:
+                    key = self.solution_cache.key(index, offspring[slot], sub_problem.d_vars_index)
+                    cached = self.solution_cache.get(key)
+                    if cached is not None:
+                        self._apply_solution(slot, sub_problem.d_vars_index, cached[0])
+                        continue
+                sub_qubo, _ = sub_problem.get_qubo(offspring[slot])
+                pending.append((slot, index, sub_problem))
+                sub_qubos.append(sub_qubo)
+                initial_states.append(offspring[slot][sub_problem.d_vars_index])
+            if len(pending) == 0:
+                continue
+
+            kwargs = {'initial_states': np.array(initial_states)} if self.warm_start else {}
+            solutions, energies = self.batch_optimizer(np.array(sub_qubos), **kwargs)
+            self.n_annealer_calls += len(sub_qubos)
+            for (slot, index, sub_problem), solution, energy in zip(pending, solutions, energies):
+                if self.solution_cache is not None:
+                    key = self.solution_cache.key(index, offspring[slot], sub_problem.d_vars_index)
+                    self.solution_cache.put(key, solution, energy)
+                self._apply_solution(slot, sub_problem.d_vars_index, solution)
+
+
+    def _apply_solution(self, slot, d_vars_index, solution):
+        chromosome = self.population.offspring[slot]
+        if self.incremental_evaluation:
+            flips = d_vars_index[chromosome[d_vars_index] != solution]
+            field = self.population.offspring_fields[slot]
+            self.population.offspring_fitness[slot] += self.qubo.flip_delta(chromosome, field, flips)
+        chromosome[d_vars_index] = solution
+
+
+    def _solve_sub_problem(self, index, sub_problem, chromosome):
+        '''
+        Solution of a sub problem, taken from the solution cache if the frozen variables were seen before
+        '''
+        if self.solution_cache is not None:
+            key = self.solution_cache.key(index, chromosome, sub_problem.d_vars_index)
+            cached = self.solution_cache.get(key)
+            if cached is not None:
+                return cached[0]
+
+        model = None if self.models is None else self.models[index]
+        solution, energy = sub_problem.solve(chromosome, self.local_optimizer, self.warm_start, model)
+        self.n_annealer_calls += 1
+
+        if self.solution_cache is not None:
+            self.solution_cache.put(key, solution, energy)
+        return solution
+
+
+    def _parallel_local_optimization(self, pool : LocalOptimizationPool):
+        '''
+        Collects the offspring selected for local optimization and optimizes them on the process pool.
+        Selection, sub problem orders and worker seeds are drawn in slot order, so the result does not
+        depend on the number of workers.
+        '''
+        offspring = self.population.offspring
+        selected, orders, seeds = self._select_for_local_optimization()
+        if len(selected) == 0:
+            return
+
+        results = pool.optimize(offspring[selected], orders, seeds)
+        self.n_annealer_calls += len(selected) * self.qubo.n_sub_problems # the workers do not use the solution cache
+        for slot, chromosome in zip(selected, results):
+            if self.incremental_evaluation:
+                flips = np.flatnonzero(chromosome != offspring[slot])
+                field = self.population.offspring_fields[slot]
+                self.population.offspring_fitness[slot] += self.qubo.flip_delta(offspring[slot], field, flips)
+            offspring[slot] = chromosome
+
+
+    def _ensure_fields(self, slots : np.ndarray):
+        '''
+        Computes the local fields of the given population slots that do not have one yet
+        '''
+        missing = slots[~self.population.has_field[slots]]
+        if len(missing) > 0:
+            self.population.fields[missing] = self.qubo.local_field(self.population.chromosomes[missing])
+            self.population.has_field[missing] = True
+
+
+    def _evaluate_incremental(self, parent_indices):
+        '''
+        Scores the offspring close to one of their parents by the bits in which they differ from it, the
+        flips of the whole generation are evaluated with one sparse product, see QUBO.flip_deltas. Offspring
+        far from both parents are evaluated in full, their fields are computed when they are needed.
+        :param parent_indices: population indices of the parents per offspring, shape (n_offspring, 2)
+        '''
+        offspring = self.population.offspring
+        parents = self.population.parents
+        fitness = self.population.offspring_fitness
+        has_field = self.population.has_field[self.n_individuals:]
+
+        first = offspring ^ parents[parent_indices[:, 0]]
+        second = offspring ^ parents[parent_indices[:, 1]]
+        n_first, n_second = np.count_nonzero(first, axis=1), np.count_nonzero(second, axis=1)
+        use_second = n_second < n_first
+        close = np.where(use_second, n_second, n_first) <= self.qubo.incremental_fraction * self.qubo.n_vars
+        near, far = np.flatnonzero(close), np.flatnonzero(~close)
+
+        if len(near) > 0:
+            base = np.where(use_second, parent_indices[:, 1], parent_indices[:, 0])[near]
+            flips = np.where(use_second[near, None], second[near], first[near]).view(bool)
+            self._ensure_fields(np.unique(base))
+            # the fields of the offspring start as copies of the fields of their closer parents
+            fields = self.population.offspring_fields if len(near) == len(offspring) else np.empty((len(near), self.qubo.n_vars))
+            np.take(self.population.fields, base, axis=0, out=fields)
+            fitness[near] = self.population.fitness[base] + self.qubo.flip_deltas(parents[base], fields, flips)
+            if len(near) < len(offspring):
+                self.population.offspring_fields[near] = fields
+            has_field[near] = True
+
+        if len(far) > 0:
+            if self._local_search(): # the local optimization tracks its energy change with the fields
+                fitness[far], self.population.offspring_fields[far] = self.qubo.evaluate_fields(offspring[far])
+                has_field[far] = True
+            else:
+                fitness[far] = self.qubo.evaluate_batch(offspring[far])
+                has_field[far] = False
 
     
-    def uniform_crossover_sequence(self):
-        probabilities = np.random.uniform(0.0, 1.0, self.qubo.n_vars)
+    def uniform_crossover_sequence(self, n_sequences = None):
+        size = self.qubo.n_vars if n_sequences is None else (n_sequences, self.qubo.n_vars)
+        probabilities = np.random.uniform(0.0, 1.0, size)
 
         return probabilities > self.bias
     
 
+    def _generate_offspring(self):
+        '''
+        Selection, crossover and mutation for the whole generation at once, the
+        offspring are written into their reserved population slots
+        :return: population indices of the parents per offspring, shape (n_offspring, 2)
+        '''
+        n_pairs = int(self.n_individuals / 2)
+        parents = self.population.parents
+        offspring = self.population.offspring
+
+        # selecting parents probabilistic, the first index where the cumulative probability exceeds r
+        r = np.random.uniform(0, 1, (n_pairs, 2))
+        pairs = np.searchsorted(self.probabilities_cumsum, r, side='right')
+        pairs = np.minimum(pairs, self.n_individuals - 1) # guard against rounding of the cumulative sum
+
+        # first offspring of a pair inherits from (parent_1, parent_2), the second one from (parent_2, parent_1)
+        parent_indices = np.empty((2 * n_pairs, 2), dtype=int)
+        parent_indices[0::2] = pairs
+        parent_indices[1::2] = pairs[:, ::-1]
+
+        # crossover: genes from the first parent where crossover is 1, from the second parent where crossover is 0
+        crossover_sequences = self.uniform_crossover_sequence(2 * n_pairs)
+        offspring[:] = parents[parent_indices[:, 1]]
+        np.copyto(offspring, parents[parent_indices[:, 0]], where=crossover_sequences)
+
+        # mutation sequences are arrays of [0,1], with a probabilty of mutation_rate for each index to be 1
+        offspring ^= np.random.random(offspring.shape) < self.mutation_rate
+        return parent_indices
+    
+
     def optimize(self):
+        '''
+        Runs the remaining generations and closes the process pool
+        :return: evolution data, qhea.recorder.Recorder
+        '''
+        try:
+            return self.evolve(self.n_generations - self.generation)
+        finally:
+            self.close()
 
-        for gen in range(self.n_generations): # evolution loop
-            self.mutation_rate = 1 / (gen + 1)
-            for ind in range(int(self.n_individuals / 2)):            
-                # mutation sequence is an array of [0,1], with a probabilty of mutation_rate for each index to be 1
-                mutation_sequence_1 = np.random.random(self.qubo.n_vars) < self.mutation_rate # mutation sequence 1
-                mutation_sequence_2 = np.random.random(self.qubo.n_vars) < self.mutation_rate # mutation sequence 2
-
-                # selecting parents probabilistic
-                parents = np.array([[0, np.random.randint(0, 2, self.qubo.n_vars)] for j in range(2)],
-                      dtype=object)
-                
-                r = np.random.uniform(0,1)
-
-                index_1 = np.where(self.probabilities_cumsum > r)[0][0]
-                parents[0] = self.population[index_1]
-
-                r = np.random.uniform(0,1)
-         
-                # select parent_2        
-                index_2 = np.where(self.probabilities_cumsum > r)[0][0]
-                parents[1] = self.population[index_2]
-                # mutation sequence is an array of [0,1], with a probabilty of mutation_rate for each index to be 1
-                mutation_sequence_1 = np.random.random(self.qubo.n_vars) < self.mutation_rate # mutation sequence 1
-                mutation_sequence_2 = np.random.random(self.qubo.n_vars) < self.mutation_rate # mutation sequence 2
-                
-                crossover_sequence = self.uniform_crossover_sequence()
-                # crossover with selected parents (first child), then mutation
-                offspring_1_chromosome = np.logical_xor(
-                np.add(
-                    np.logical_and(parents[0][self.value], crossover_sequence), # getting the genes from first parent (where crossover is 1)
-                    np.logical_and(parents[1][self.value], np.logical_not(crossover_sequence)) # getting the genes from second parent (where crossover is 0)
-                ),mutation_sequence_1)
-
-                crossover_sequence = self.uniform_crossover_sequence()
-                # crossover with selected parents (second child), then mutation
-                offspring_2_chromosome = np.logical_xor(
-                np.add(
-                    np.logical_and(parents[1][self.value], crossover_sequence), # getting the genes from second parent (where crossover is 1)
-                    np.logical_and(parents[0][self.value], np.logical_not(crossover_sequence))  # getting the genes from first parent (where crossover is 0)
-                ), mutation_sequence_2)
-                # note how the order of parents changed for individual 2
-                self.population = np.vstack([self.population, np.array([0, offspring_1_chromosome], dtype=object)], dtype=object)
-                self.population = np.vstack([self.population, np.array([0, offspring_2_chromosome], dtype=object)], dtype=object)
-
-                if self.local_optimizer != None:
-                    offspring_1_chromosome = self.local_optimization(offspring_1_chromosome)
-                    offspring_2_chromosome = self.local_optimization(offspring_2_chromosome)
-                
-                
-            # apply fitness to every new individual
-            for ind in range(self.n_individuals, len(self.population)):
-                self.population[ind][self.fitness] = self.qubo.objective_function(self.population[ind][self.value])
-            
-            # sort ascending by fitness
-            self.population = self.population[self.population[:, self.fitness].argsort()]
-            self.population = self.population[:self.n_individuals]
-            # add fittest individual to data set
-            self.data.add_individual(self.population[0])
-        
-        # when done, return data set
+
+    def close(self):
+        '''
+        Shuts the process pool down, a later generation starts a new one
+        '''
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+    def _get_pool(self):
+        '''
+        :return: process pool of the local optimization, None if the generations run in this process
+        '''
+        if self._pool is None and self._local_search() and self.batch_optimizer is None and self.n_workers is not None:
+            self._pool = LocalOptimizationPool(self.qubo, self.local_optimizer, self.n_workers, self.warm_start, self.models)
+        return self._pool
+
+
+    def evolve(self, n_generations : int):
+        '''
+        Runs n_generations generations, continuing from the current state, fewer if a stopping criterion is met
+        :return: evolution data, qhea.recorder.Recorder
+        '''
+        for _ in self.generations(n_generations):
+            pass
         return self.data
-    
\ No newline at end of file
+
+
+    def generations(self, n_generations : int = None):
+        '''
+        Generator mode of evolve, yields the solver after every generation. The caller can watch the progress,
+        e.g. solver.generation and solver.best_fitness, and stop early by leaving the loop. The process pool
+        (n_workers) stays open for further generations, see close.
+        :param n_generations: number of generations, defaults to the remaining generations of the parameters
+        '''
+        if n_generations is None:
+            n_generations = self.n_generations - self.generation
+        clock = time.monotonic()
+        pool = self._get_pool()
+        self.stop_reason = None
+        for _ in range(n_generations):
+            self.elapsed_time += time.monotonic() - clock
+            clock = time.monotonic()
+            if self.stopping is not None:
+                self.stop_reason = self.stopping.reason(self)
+                if self.stop_reason is not None:
+                    break
+
+            self._evolve(pool)
+            if self.callback is not None and self.callback(self):
+                self.stop_reason = 'callback'
+            self.elapsed_time += time.monotonic() - clock
+            yield self
+            clock = time.monotonic()
+            if self.stop_reason is not None:
+                break
+        else:
+            self.elapsed_time += time.monotonic() - clock
+            if self.stopping is not None:
+                self.stop_reason = self.stopping.reason(self)
+
+        if self.checkpoint_path is not None:
+            self.checkpoint()
+
+
+    def emigrants(self, n_migrants : int):
+        '''
+        :return: copies of the chromosomes and fitness values of the n_migrants fittest individuals
+        '''
+        return self.population.parents[:n_migrants].copy(), self.population.fitness[:n_migrants].copy()
+
+
+    def immigrate(self, chromosomes : np.ndarray, fitness : np.ndarray):
+        '''
+        Replaces the least fit individuals with immigrants
+        :param chromosomes: chromosomes of the immigrants, one per row
+        :param fitness: fitness values of the immigrants
+        '''
+        n_migrants = min(len(fitness), self.n_individuals)
+        slots = np.arange(self.n_individuals - n_migrants, self.n_individuals)
+        self.population.parents[slots] = chromosomes[:n_migrants]
+        self.population.fitness[slots] = fitness[:n_migrants]
+        if self.incremental_evaluation:
+            self.population.has_field[slots] = False
+        self.population.select(self.n_individuals)
+        if self.population.fitness[0] < self.best_fitness:
+            self.best_fitness = self.population.fitness[0]
+            self.last_improvement = self.generation
+
+
+    def _evolve(self, pool):
+        '''
+        Runs one generation
+        '''
+        offspring = self.population.offspring
+        gen = self.generation
+        self.mutation_rate = 1 / (gen + 1)
+        parent_indices = self._generate_offspring()
+
+        if self.incremental_evaluation:
+            self._evaluate_incremental(parent_indices)
+
+        if self.batch_optimizer is not None:
+            self._batch_local_optimization()
+        elif pool is not None:
+            self._parallel_local_optimization(pool)
+        elif self._local_search():
+            for slot in range(self.population.n_offspring):
+                field = self.population.offspring_fields[slot] if self.incremental_evaluation else None
+                _, delta = self.local_optimization(offspring[slot], field)
+                if delta is not None:
+                    self.population.offspring_fitness[slot] += delta
+
+        # apply fitness to every new individual
+        if not self.incremental_evaluation:
+            self.population.offspring_fitness[:] = self.qubo.evaluate_batch(offspring)
+        self.n_evaluations += self.population.n_offspring
+
+        # sort ascending by fitness and keep the fittest
+        self.population.select()
+        # add fittest individual to data set
+        self.data.add_individual(self.population.individual(0))
+        self.generation += 1
+        if self.population.fitness[0] < self.best_fitness:
+            self.best_fitness = self.population.fitness[0]
+            self.last_improvement = self.generation
+
+        if self.checkpoint_path is not None and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
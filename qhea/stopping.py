@@ -0,0 +1,37 @@
+class StoppingCriteria():
+    '''
+    Termination conditions of a Qhea run, the run stops before the next generation as soon as one of them
+    is met. Criteria that are None are not checked.
+    '''
+    def __init__(self, time_limit : float = None, max_evaluations : int = None, max_annealer_calls : int = None,
+                 target_fitness : float = None, stagnation_window : int = None):
+        '''
+        :param time_limit: wall clock budget in seconds, counted while the solver evolves
+        :param max_evaluations: budget of fitness evaluations, full and incremental ones
+        :param max_annealer_calls: budget of sub qubos passed to the local optimizer, cached solutions are free
+        :param target_fitness: stop when the fittest individual reaches this fitness, e.g. a known minimum
+        :param stagnation_window: stop after this many generations without improvement of the fittest individual
+        '''
+        self.time_limit = time_limit
+        self.max_evaluations = max_evaluations
+        self.max_annealer_calls = max_annealer_calls
+        self.target_fitness = target_fitness
+        self.stagnation_window = stagnation_window
+
+
+    def reason(self, solver) -> str:
+        '''
+        :param solver: qhea.solver.Qhea
+        :return: name of the first criterion that is met, None if the run can continue
+        '''
+        if self.target_fitness is not None and solver.best_fitness <= self.target_fitness:
+            return 'target_fitness'
+        if self.time_limit is not None and solver.elapsed_time >= self.time_limit:
+            return 'time_limit'
+        if self.max_evaluations is not None and solver.n_evaluations >= self.max_evaluations:
+            return 'max_evaluations'
+        if self.max_annealer_calls is not None and solver.n_annealer_calls >= self.max_annealer_calls:
+            return 'max_annealer_calls'
+        if self.stagnation_window is not None and solver.generation - solver.last_improvement >= self.stagnation_window:
+            return 'stagnation_window'
+        return None
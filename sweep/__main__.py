@@ -0,0 +1,52 @@
+'''
+Runs a parameter sweep from a json configuration:
+
+    python -m sweep config.json
+
+{
+    "output": "results/bias",
+    "instances": ["distances-50-1-100"],
+    "seeds": [0, 1, 2, 3, 4],
+    "parameters": {"optimiziation_rate": [0.01], "n_individuals": [100], "n_generations": [1000],
+                   "selection_pressure": [2], "bias": [0.3, 0.5, 0.7]},
+    "local_optimizer": "annealing.tabu_search",
+    "sub_problem_size": 10,
+    "penalty": 100
+}
+
+"parameters" is a grid (lists of values per argument of Parameters) or a list of argument dicts.
+Further keys are passed to Sweep (e.g. n_workers, max_tasks_per_child, memory_limit) and to Qhea.
+'''
+import argparse
+import json
+
+from qhea.parameters import Parameters
+from .runner import Sweep, parameter_grid
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m sweep', description='Runs a parameter sweep of Qhea')
+    parser.add_argument('config', help='json configuration of the sweep')
+    parser.add_argument('--n-workers', type=int, default=None, help='number of processes, defaults to the number of cpus')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    parameters = config.pop('parameters')
+    if isinstance(parameters, dict):
+        parameters = parameter_grid(**parameters)
+    else:
+        parameters = [Parameters(**arguments) for arguments in parameters]
+    if args.n_workers is not None:
+        config['n_workers'] = args.n_workers
+
+    sweep = Sweep(parameters, config.pop('instances'), config.pop('seeds'), config.pop('output'), **config)
+    n_cells, n_pending = len(sweep.cells()), len(sweep.pending())
+    print(f'{n_cells} cells, {n_cells - n_pending} already complete')
+    for path in sweep.run():
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import hashlib
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import benchmark
+import json_db
+from qhea.parameters import Parameters
+from qhea.problem import QUBO, TSPQUBO
+from qhea.recorder import Recorder
+from qhea.solver import Qhea
+from qhea.stopping import StoppingCriteria
+
+__all__ = ['parameter_grid', 'Sweep', 'load_results']
+
+# keyword arguments of Qhea that are callables, passed to the workers as dotted paths like local_optimizer
+CALLABLE_KWARGS = ('local_model', 'batch_optimizer')
+
+
+def parameter_grid(**values) -> list[Parameters]:
+    '''
+    :param values: list of values per argument of Parameters, e.g. bias=[0.3, 0.5]
+    :return: one Parameters object per combination
+    '''
+    names = list(values)
+    return [Parameters(**dict(zip(names, combination))) for combination in itertools.product(*values.values())]
+
+
+def load_instance(name : str, sub_problem_size : int, penalty : float) -> QUBO:
+    '''
+    :param name: name of a benchmark.distances tsp (TSPQUBO with penalty) or of a benchmark.problem qubo
+    '''
+    if name in benchmark.distances.get_tsp_names():
+        return TSPQUBO(np.asarray(benchmark.distances.get_tsp(name).distances), sub_problem_size, penalty)
+    return QUBO(np.asarray(benchmark.problem.get_instance(name).qubo), sub_problem_size)
+
+
+def _resolve(optimizer):
+    '''
+    :param optimizer: None, a callable or a dotted path such as 'annealing.tabu_search'
+    '''
+    if optimizer is None or callable(optimizer):
+        return optimizer
+    module, name = optimizer.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def _optimizer_name(optimizer):
+    '''
+    :return: dotted path of an importable module level function, the optimizer itself if it is None or a string
+    '''
+    if optimizer is None or isinstance(optimizer, str):
+        return optimizer
+    module, name = getattr(optimizer, '__module__', None), getattr(optimizer, '__qualname__', None)
+    path = f'{module}.{name}'
+    try:
+        importable = module is not None and name is not None and _resolve(path) is optimizer
+    except (ImportError, AttributeError):
+        importable = False
+    if not importable:
+        raise ValueError(f'{optimizer!r} cannot be imported by the workers, pass a dotted path or a module level function')
+    return path
+
+
+def _limit_memory(memory_limit):
+    if memory_limit is not None:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def run_cell(cell : dict, path : str) -> str:
+    '''
+    Runs one cell of a sweep. The evolution is streamed into path + '.partial', the log is renamed to path
+    when the run is complete, the fittest chromosome is saved next to it (.solution.npy).
+    :return: path of the log
+    '''
+    np.random.seed(cell['seed'])
+    qubo = load_instance(cell['instance'], cell['sub_problem_size'], cell['penalty'])
+    partial_path = path + '.partial'
+    if os.path.exists(partial_path):
+        os.remove(partial_path) # left over by an interrupted run
+
+    qhea_kwargs = dict(cell['qhea_kwargs'])
+    if qhea_kwargs.get('stopping') is not None:
+        qhea_kwargs['stopping'] = StoppingCriteria(**qhea_kwargs['stopping'])
+    for key in CALLABLE_KWARGS:
+        if key in qhea_kwargs:
+            qhea_kwargs[key] = _resolve(qhea_kwargs[key])
+
+    metadata = {key: value for key, value in cell.items() if key != 'label'}
+    with json_db.LogWriter(partial_path, label=cell['label'], **metadata) as writer:
+        solver = Qhea(qubo, Parameters(**cell['parameters']), _resolve(cell['local_optimizer']),
+                      recorder=Recorder(sink=writer), **qhea_kwargs)
+        data = solver.optimize()
+    np.save(path + '.solution.npy', data.get_solution()[Recorder.value])
+    os.replace(partial_path, path)
+    return path
+
+
+class Sweep():
+    '''
+    Runs every combination of parameters, instances and seeds (cell) on a process pool. Every cell writes one
+    binary log (json_db.LogWriter) into the output directory, cells with a complete log are skipped, so an
+    interrupted sweep continues where it stopped.
+    '''
+    def __init__(self, parameters : list[Parameters], instances : list[str], seeds : list[int], output : str,
+                 local_optimizer = None, sub_problem_size : int = 10, penalty : float = 1000, n_workers : int = None,
+                 max_tasks_per_child : int = 1, memory_limit : int = None, **qhea_kwargs):
+        '''
+        :param parameters: Parameters objects, e.g. from parameter_grid
+        :param instances: instance names, see load_instance
+        :param seeds: seeds of the numpy random state, every configuration runs once per seed
+        :param output: directory of the logs
+        :param local_optimizer: dotted path of the local optimizer, e.g. 'annealing.tabu_search', or an importable
+                                module level function (no lambda, closure or functools.partial)
+        :param n_workers: number of processes, defaults to the number of cpus
+        :param max_tasks_per_child: cells a worker process runs before it is replaced, bounds leaked memory
+        :param memory_limit: optional limit of the address space per worker in bytes
+        :param qhea_kwargs: further keyword arguments for Qhea, have to be json serializable, stopping is given
+                            as dict of StoppingCriteria arguments, e.g. stopping={'time_limit': 60}, local_model
+                            and batch_optimizer like local_optimizer, e.g. batch_optimizer='annealing.anneal_batch'
+        '''
+        self.parameters = parameters
+        self.instances = instances
+        self.seeds = seeds
+        self.output = output
+        self.local_optimizer = _optimizer_name(local_optimizer)
+        _resolve(self.local_optimizer) # fails early on a wrong dotted path
+        self.sub_problem_size = sub_problem_size
+        self.penalty = penalty
+        self.n_workers = n_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_limit = memory_limit
+        for key in CALLABLE_KWARGS:
+            if key in qhea_kwargs:
+                qhea_kwargs[key] = _optimizer_name(qhea_kwargs[key])
+                _resolve(qhea_kwargs[key])
+        self.qhea_kwargs = qhea_kwargs
+
+
+    def cells(self) -> list[dict]:
+        optimizer = self.local_optimizer
+        cells = []
+        for parameters, instance, seed in itertools.product(self.parameters, self.instances, self.seeds):
+            cell = {
+                'parameters': vars(parameters),
+                'instance': instance,
+                'seed': seed,
+                'local_optimizer': optimizer,
+                'sub_problem_size': self.sub_problem_size,
+                'penalty': self.penalty,
+                'qhea_kwargs': self.qhea_kwargs
+            }
+            cell['label'] = ' '.join(f'{key}={value}' for key, value in vars(parameters).items())
+            cells.append(cell)
+        return cells
+
+
+    def path(self, cell : dict) -> str:
+        '''
+        :return: log path of a cell, named by the instance, a hash of the configuration and the seed
+        '''
+        configuration = {key: value for key, value in cell.items() if key not in ('seed', 'label')}
+        digest = hashlib.blake2b(json.dumps(configuration, sort_keys=True).encode(), digest_size=6).hexdigest()
+        return os.path.join(self.output, json_db.get_log_name(f"{cell['instance']}_{digest}_seed{cell['seed']}"))
+
+
+    def pending(self) -> list[dict]:
+        return [cell for cell in self.cells() if not os.path.exists(self.path(cell))]
+
+
+    def run(self) -> list[str]:
+        '''
+        Runs all pending cells
+        :return: log paths of the cells completed by this call
+        '''
+        os.makedirs(self.output, exist_ok=True)
+        pending = self.pending()
+        if len(pending) == 0:
+            return []
+
+        # max_tasks_per_child needs fresh processes, they are spawned instead of forked
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 max_tasks_per_child=self.max_tasks_per_child, initializer=_limit_memory,
+                                 initargs=(self.memory_limit,)) as executor:
+            futures = [executor.submit(run_cell, cell, self.path(cell)) for cell in pending]
+            return [future.result() for future in as_completed(futures)]
+
+
+def load_results(output : str) -> list[json_db.LogReader]:
+    '''
+    :return: logs of all completed cells in the output directory, configuration in LogReader.metadata
+    '''
+    names = sorted(name for name in os.listdir(output) if name.endswith('.qlog'))
+    return [json_db.load_log(os.path.join(output, name)) for name in names]
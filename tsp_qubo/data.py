@@ -1,25 +1,17 @@
-import json
 import os
+from util.store import InstanceStore
 
 __all__ = ['get_instance_from_json']
-def get_instance_from_json(index):
-    f = open(os.path.join(os.path.dirname(__file__), "data.json"), "r")
-    problems = json.load(f)
-    f.close()
 
-    return problems["problems"][index]
+_store = InstanceStore(os.path.join(os.path.dirname(__file__), "data.json"), list_key="problems")
+
+
+def get_instance_from_json(index):
+    return _store.get(index)
 
 
 def add_instance(instance):
-    f = open(os.path.join(os.path.dirname(__file__), "data.json"), "r+")
-    data = json.load(f)
-    f.seek(0)
-    f.truncate()
-    print("data")
-    print(data)
-    data["problems"].append(instance)
-    json.dump(data, f)
-    f.close()
+    _store.append(instance)
 
 
 def data_to_dict(name, tsp, tsp_qubo, minimum_tsp, minimum_tsp_qubo, penalty, distance_from, distance_to):
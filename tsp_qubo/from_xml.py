@@ -1,3 +1,4 @@
+import hashlib
 import os
 import sys
 import xml.etree.ElementTree as ET
@@ -21,62 +22,170 @@ def get_optimum(name: str):
     return problems.get(name)
 
 
-def get_problem(file_name: str) -> list[list[float]]:
-    root_node = ET.parse(os.path.join(os.path.dirname(__file__), file_name)).getroot()
-    vertexes = root_node.findall("graph/vertex")
-    matrix = np.array([[float(0) for i in range(len(vertexes))] for j in range(len(vertexes))])
+def get_problem(file_name: str, cache: bool = True) -> np.ndarray:
+    '''
+    Distance matrix of a problem, either a TSPLIB xml file or a coordinate based TSPLIB .tsp file
+    :param file_name: file name relative to this package, or an absolute path
+    :param cache: if True the matrix is cached as .npy next to the source file, keyed by the hash of the
+                  source, and reloaded memory mapped (copy on write)
+    :return: distance matrix
+    '''
+    path = os.path.join(os.path.dirname(__file__), file_name)
+    parse = _parse_tsp if path.endswith(".tsp") else _parse_xml
+    if not cache:
+        return parse(path)
+
+    cache_path = path + "." + _file_digest(path) + ".npy"
+    if os.path.exists(cache_path):
+        return np.load(cache_path, mmap_mode="c")
+
+    matrix = parse(path)
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, cache_path)
+    except OSError: # read only location, the matrix is just not cached
+        pass
+    return matrix
 
-    for i in range(len(vertexes)):
-        edges = vertexes[i].findall("edge")
-        for j in range(len(edges)):
-            node_from = i
-            node_to = int(edges[j].text)
-            cost = float(edges[j].attrib["cost"])
-            matrix[node_from][node_to] = cost
 
+def _file_digest(path):
+    '''
+    Hash of the file content. The digest is remembered in a small sidecar file together with size and
+    modification time, so an unchanged file is not hashed again.
+    '''
+    stat = os.stat(path)
+    sidecar = path + ".digest"
+    key = f"{stat.st_size} {stat.st_mtime_ns}"
+    try:
+        with open(sidecar) as f:
+            stored_key, digest = f.read().rsplit(" ", 1)
+        if stored_key == key:
+            return digest
+    except (OSError, ValueError):
+        pass
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    try:
+        with open(sidecar, "w") as f:
+            f.write(key + " " + digest)
+    except OSError:
+        pass
+    return digest
+
+
+def _parse_xml(path):
+    '''
+    Streams the xml with iterparse, every vertex is written into the matrix as one row.
+    The matrix is allocated from the first vertex (complete graph) and grown if needed.
+    '''
+    matrix = None
+    row = 0
+    targets, costs = [], []
+    for event, element in ET.iterparse(path, events=("end",)):
+        if element.tag == "edge":
+            targets.append(element.text)
+            costs.append(element.attrib["cost"])
+        elif element.tag == "vertex":
+            targets = np.array(targets, dtype=int)
+            size = max(row + 1, len(targets) + 1, targets.max(initial=-1) + 1)
+            if matrix is None:
+                matrix = np.zeros((size, size))
+            elif size > len(matrix):
+                matrix = np.pad(matrix, (0, size - len(matrix)))
+            matrix[row, targets] = np.array(costs, dtype=float)
+            row += 1
+            targets, costs = [], []
+            element.clear()
+
+    if matrix is None:
+        return np.zeros((0, 0))
+    return matrix[:max(row, matrix.shape[1]), :max(row, matrix.shape[1])]
+
+
+def _parse_tsp(path):
+    '''
+    Coordinate based TSPLIB file, supported edge weight types are EUC_2D, CEIL_2D, ATT and GEO
+    '''
+    header = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("NODE_COORD_SECTION"):
+                break
+            if ":" in line:
+                key, value = line.split(":", 1)
+                header[key.strip()] = value.strip()
+        dimension = int(header["DIMENSION"])
+        coordinates = np.loadtxt(f, max_rows=dimension, usecols=(1, 2), ndmin=2)
+
+    weight_type = header.get("EDGE_WEIGHT_TYPE")
+    x, y = coordinates[:, 0], coordinates[:, 1]
+    if weight_type in ("EUC_2D", "CEIL_2D", "ATT"):
+        dx = x[:, None] - x[None, :]
+        dy = y[:, None] - y[None, :]
+        if weight_type == "EUC_2D":
+            matrix = np.floor(np.sqrt(dx ** 2 + dy ** 2) + 0.5)
+        elif weight_type == "CEIL_2D":
+            matrix = np.ceil(np.sqrt(dx ** 2 + dy ** 2))
+        else:
+            r = np.sqrt((dx ** 2 + dy ** 2) / 10.0)
+            t = np.floor(r + 0.5)
+            matrix = np.where(t < r, t + 1, t)
+    elif weight_type == "GEO":
+        latitude, longitude = _geo_radians(x), _geo_radians(y)
+        q1 = np.cos(longitude[:, None] - longitude[None, :])
+        q2 = np.cos(latitude[:, None] - latitude[None, :])
+        q3 = np.cos(latitude[:, None] + latitude[None, :])
+        matrix = np.floor(6378.388 * np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), -1, 1)) + 1)
+    else:
+        raise ValueError(f"unsupported EDGE_WEIGHT_TYPE {weight_type}")
+
+    np.fill_diagonal(matrix, 0)
     return matrix
 
 
-# function takes xml file name as parameter and
+def _geo_radians(values):
+    degrees = np.trunc(values)
+    return 3.141592 * (degrees + 5.0 * (values - degrees) / 3.0) / 180.0
+
+
+# function takes the tsp distance matrix as parameter and
 # prepares a black box cost function that will
 # calculate the penalties on the fly
 # cost function will be returned
 def get_cost_function(problem, penalty):
-    # problem is the tsp distance matrix
+    # problem is the tsp distance matrix, it is copied and stays untouched
+    distances = np.array(problem, dtype=float)
+    nodes = len(distances)
 
-    # apply a penalty on the main diagonal axis such that
-    # the solving algorithm will be punished if it does "not move"
-    # from one node to another
-    for i in range(len(problem)):
-        problem[i][i] += 2 * penalty
+    # main diagonal of the imaginary qubo matrix: the value from the distance matrix - 2 * the penalty term,
+    # given by the constraints. The main diagonal of the distance matrix gets an extra 2 * penalty
+    # such that the solving algorithm will be punished if it does "not move" from one node to another
+    linear = (distances + 2 * penalty * np.eye(nodes) - 2 * penalty).ravel()
 
     # cost function declaration
-    def cost_function(vec, tsp_distances=problem):
-        # the dimension of the corresponding vector is of
-        # length len(tsp_distances) ** 2. The dimension of the
-        # qubo matrix would be dimension ** 2
-        dimension = len(vec)
-        fitness = 0
-        nodes = len(tsp_distances)
-        # iterate over imaginary qubo matrix rows
-        for i in range(dimension):
-            # iterate over imaginary qubo matrix columns
-            for j in range(i,dimension):
-                # if i == j, the position is on the main diagonal axis of the imaginary qubo matrix
-                # These entries correspond to a value from the distance matrix, such as from node 0 to 1 etc.
-                if i == j:
-                    # the value of the imaginary qubo matrix is the value from the distance matrix - 2 * the penalty
-                    # term, given by the constraints.
-                    fitness += (vec[i] * (tsp_distances[int(i / nodes)][i % nodes] - 2 * penalty ) * vec[i])
-
-                # in the case where i != j, there are constrained applied such that rows and cols my only have one
-                # entry. That constrained is 1 * the penalty term. If j / node_count == i / node_count,
-                # it is the same row. If j % node_count == i % node_count, it is the same column.
-                elif int(j / nodes) == int(i / nodes) or j % nodes == i % nodes:
-                    fitness += vec[i] * penalty * vec[j] * 2
-
-        # function returns the fitness of the individual
-        return fitness
+    def cost_function(vec):
+        '''
+        :param vec: binary vector of length nodes ** 2, or a population matrix with one vector per row
+        :return: fitness, one value per row for a population matrix
+        '''
+        vecs = np.asarray(vec)
+        x = vecs.reshape(-1, nodes, nodes)
+        # constraints: rows and cols may only have one entry, every pair of entries in the same
+        # row or the same column costs 2 * penalty, a row with r entries has r * (r - 1) / 2 pairs
+        rows = x.sum(axis=2)
+        cols = x.sum(axis=1)
+        fitness = x.reshape(len(x), -1) @ linear
+        fitness += penalty * ((rows * (rows - 1)).sum(axis=1) + (cols * (cols - 1)).sum(axis=1))
+
+        # function returns the fitness of the individual (of every individual)
+        return fitness if vecs.ndim == 2 else fitness[0]
 
     # function returns the prepared cost function such that it can be used by a solver / ea
     return cost_function
@@ -1,10 +1,12 @@
 import math
 
 import numpy as np
+import scipy.sparse
 from util import rand, generate
 from tsp_qubo import solver, data
 
-__all__ = ['random_tsp', 'random_tsp_qubo']
+__all__ = ['random_tsp', 'random_tsp_qubo', 'random_tsps', 'random_tsp_qubos', 'generate_bundle', 'save_bundle',
+           'load_bundle']
 
 
 def generate_and_save(name, nodes, min_val, max_val, penalty):
@@ -26,21 +28,29 @@ def generate_and_save(name, nodes, min_val, max_val, penalty):
 
 
 # generate random tsp distances
-def random_tsp(nodes, min_val, max_val, penalty):
-    matrix = generate.generate_matrix(nodes)
+def random_tsp(nodes, min_val, max_val, penalty, rng : np.random.Generator = None):
+    return random_tsps(1, nodes, min_val, max_val, rng)[0]
 
-    for i in range(nodes):
-        for j in range(i, nodes):
-            if i != j:
-                r = rand.random_int_range(min_val, max_val)
-                matrix[i][j] += r
-                matrix[j][i] += r
 
-    return matrix
+def random_tsps(n_instances, nodes, min_val, max_val, rng : np.random.Generator = None) -> np.ndarray:
+    '''
+    Symmetric random distance matrices with zero diagonal
+    :param rng: numpy random generator, see util.rand.get_generator
+    :return: distances, shape (n_instances, nodes, nodes), values in [min_val, max_val)
+    '''
+    rng = rand.get_generator(rng)
+    upper = np.triu(rng.integers(min_val, max_val, (n_instances, nodes, nodes)), 1)
+    return upper + upper.transpose(0, 2, 1)
 
 
 # generate a random tsp qubo matrix with applied penalties
-def random_tsp_qubo(tsp, penalty):
+def random_tsp_qubo(tsp, penalty, sparse=False):
+    '''
+    :param sparse: if True a scipy.sparse csr_array is returned
+    '''
+    if sparse:
+        return _sparse_tsp_qubo(np.asarray(tsp), penalty)
+
     nodes = len(tsp)
 
     dimension = nodes ** 2
@@ -54,26 +64,110 @@ def random_tsp_qubo(tsp, penalty):
     return qubo_matrix
 
 
+def random_tsp_qubos(tsps, penalty, sparse=False):
+    '''
+    Qubos of random_tsp_qubo for a batch of distance matrices
+    :param tsps: distances, shape (n_instances, nodes, nodes)
+    :param sparse: if True a list of scipy.sparse csr_arrays is returned
+    :return: qubos, shape (n_instances, nodes^2, nodes^2)
+    '''
+    tsps = np.asarray(tsps)
+    if sparse:
+        return [_sparse_tsp_qubo(tsp, penalty) for tsp in tsps]
+
+    n_instances, nodes, _ = tsps.shape
+    dimension = nodes ** 2
+    qubos = np.broadcast_to(penalty * _penalty_pattern(nodes), (n_instances, dimension, dimension)).copy()
+    diagonal = np.arange(dimension)
+    qubos[:, diagonal, diagonal] += tsps.reshape(n_instances, dimension)
+    return qubos
+
+
+def _penalty_pattern(nodes):
+    '''
+    :return: qubo of the constraints for penalty 1, -2 on the diagonal and 1 for pairs in the same row or column
+    '''
+    index = np.arange(nodes ** 2)
+    rows, cols = index // nodes, index % nodes
+    pattern = ((rows[:, None] == rows[None, :]) | (cols[:, None] == cols[None, :])).astype(int)
+    np.fill_diagonal(pattern, -2)
+    return pattern
+
+
+def _sparse_tsp_qubo(tsp, penalty):
+    nodes = len(tsp)
+    identity = scipy.sparse.identity(nodes, dtype=int, format='csr')
+    ones = scipy.sparse.csr_array(np.ones((nodes, nodes), dtype=int))
+    constraints = scipy.sparse.kron(identity, ones, format='csr') + scipy.sparse.kron(ones, identity, format='csr')
+    qubo_matrix = penalty * (constraints - 4 * scipy.sparse.identity(nodes ** 2, dtype=int, format='csr'))
+    qubo_matrix = qubo_matrix + scipy.sparse.diags(tsp.ravel(), dtype=tsp.dtype, format='csr')
+    return scipy.sparse.csr_array(qubo_matrix)
+
+
 def apply_distances(qubo_matrix, distances):
     dimension = len(qubo_matrix)
-    nodes = int(math.sqrt(dimension))
+    diagonal = np.arange(dimension)
 
-    for i in range(dimension):
-        qubo_matrix[i][i] += distances[int(i / nodes)][i % nodes]
+    qubo_matrix[diagonal, diagonal] += np.asarray(distances).ravel()[:dimension]
 
     return qubo_matrix
 
 
 def apply_penalties(qubo_matrix, penalty):
     dimension = len(qubo_matrix)
-    nodes = math.sqrt(dimension)
-    for i in range(dimension):
-        for j in range(dimension):
+    nodes = math.isqrt(dimension)
 
-            if i == j:
-                qubo_matrix[i][j] -= 2 * penalty
-            else:
-                if int(j / nodes) == int(i / nodes) or j % nodes == i % nodes:
-                    qubo_matrix[i][j] += 1 * penalty
+    np.add(qubo_matrix, penalty * _penalty_pattern(nodes), out=qubo_matrix, casting='unsafe')
 
     return qubo_matrix
+
+
+def generate_bundle(path, n_instances, nodes, min_val, max_val, penalty, rng : np.random.Generator = None,
+                    sparse=False):
+    '''
+    Generates a batch of random tsps with their qubos and writes them as one compressed bundle
+    :param path: file of the bundle (.npz)
+    :param sparse: if True the qubos are stored in csr form, see save_bundle
+    :return: distances, shape (n_instances, nodes, nodes)
+    '''
+    tsps = random_tsps(n_instances, nodes, min_val, max_val, rng)
+    save_bundle(path, tsps, penalty, sparse, min_val=min_val, max_val=max_val)
+    return tsps
+
+
+def save_bundle(path, tsps, penalty, sparse=False, **parameters):
+    '''
+    Writes distances and their qubos as compressed numpy bundle. All qubos of a batch share one
+    sparsity pattern, in sparse form the pattern is stored once and only the values per instance.
+    :param tsps: distances, shape (n_instances, nodes, nodes)
+    :param parameters: further scalar values stored with the bundle, e.g. min_val and max_val
+    '''
+    tsps = np.asarray(tsps)
+    arrays = {'tsp': tsps, 'penalty': penalty, 'sparse': sparse}
+    arrays.update(parameters)
+    if sparse:
+        pattern = _sparse_tsp_qubo(np.zeros(tsps.shape[1:], dtype=int), 1)
+        pattern.sort_indices()
+        rows = np.repeat(np.arange(pattern.shape[0]), np.diff(pattern.indptr))
+        distances = np.where(rows == pattern.indices, tsps.reshape(len(tsps), -1)[:, rows], 0)
+        arrays.update(qubo_data=penalty * pattern.data + distances, qubo_indices=pattern.indices,
+                      qubo_indptr=pattern.indptr)
+    else:
+        arrays.update(tsp_qubo=random_tsp_qubos(tsps, penalty))
+    np.savez_compressed(path, **arrays)
+
+
+def load_bundle(path) -> dict:
+    '''
+    :param path: bundle written by save_bundle
+    :return: dict with the distances ('tsp'), the qubos ('tsp_qubo', dense array or list of csr_arrays)
+             and the stored parameters
+    '''
+    with np.load(path) as bundle:
+        result = {key: bundle[key] for key in bundle.files if not key.startswith('qubo_')}
+        if bool(bundle['sparse']):
+            dimension = len(bundle['qubo_indptr']) - 1
+            result['tsp_qubo'] = [scipy.sparse.csr_array((values, bundle['qubo_indices'], bundle['qubo_indptr']),
+                                                         shape=(dimension, dimension))
+                                  for values in bundle['qubo_data']]
+    return result
@@ -1,40 +1,33 @@
+import itertools
 import math
+from concurrent.futures import ProcessPoolExecutor
 
-import tsp_qubo.validate
-import util.generate
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 
-__all__ = ['resolve_tsp', 'find_minimum_qubo_and_tsp']
+from util.worker import worker_state, init_worker
 
+__all__ = ['resolve_tsp', 'find_minimum_qubo_and_tsp', 'find_minimum_for_cost_function', 'minimum_assignment',
+           'minimum_permutation_qubo', 'held_karp']
 
-def find_minimum_qubo_and_tsp(qubo, tsp):
-    end = False
-    a = util.generate.generate_array(len(qubo))
+
+def find_minimum_qubo_and_tsp(qubo, tsp, n_workers=None):
+    '''
+    Exact minima of the qubo (x^T qubo x) and of resolve_tsp over all valid solutions (permutation matrices)
+    :param n_workers: number of processes for the branch and bound, see minimum_permutation_qubo
+    :return: dicts with the minimum and its vector, for the qubo and the tsp
+    '''
+    qubo_vector, qubo_minimum = minimum_permutation_qubo(qubo, n_workers)
+    tsp_vector, tsp_minimum = minimum_assignment(tsp)
 
     minimum_qubo_matrix = {
-        "vector": [],
-        "minimum": float("inf")
+        "vector": qubo_vector.tolist(),
+        "minimum": int(qubo_minimum)
     }
     minimum_tsp_matrix = {
-        "vector": [],
-        "minimum": float("inf")
+        "vector": tsp_vector.tolist(),
+        "minimum": int(tsp_minimum)
     }
-    while not end:
-        a, end = increment(a)
-
-        if tsp_qubo.validate.is_valid_solution(a):
-
-            result_qubo = np.sum(np.multiply(np.outer(a, a), qubo))
-            result_tsp = resolve_tsp(a, tsp)
-
-            if result_qubo < minimum_qubo_matrix["minimum"]:
-                minimum_qubo_matrix["minimum"] = int(result_qubo)
-                minimum_qubo_matrix["vector"] = a.tolist()
-
-            if result_tsp < minimum_tsp_matrix["minimum"]:
-                minimum_tsp_matrix["minimum"] = int(result_tsp)
-                minimum_tsp_matrix["vector"] = a.tolist()
-
     return minimum_qubo_matrix, minimum_tsp_matrix
 
 
@@ -46,28 +39,191 @@ def resolve_tsp(vec, tsp):
     return r
 
 
-def increment(vec):
-    for i in range(len(vec) - 1, 0, -1):
-        vec[i] = vec[i] ^ 1
-
-        if vec[i] == 1:
-            return vec, False
-
-    return vec, True
-
-
-def find_minimum_for_cost_function(cost_function, dimension):
-    end = False
-    a = np.array([0 for i in range(dimension)])
+def minimum_assignment(costs):
+    '''
+    Minimum of sum(m * costs) over all permutation matrices m, the minimum of resolve_tsp
+    :param costs: square cost matrix
+    :return: flattened permutation matrix and its cost
+    '''
+    costs = np.asarray(costs)
+    rows, cols = linear_sum_assignment(costs)
+    m = np.zeros(costs.shape, dtype=int)
+    m[rows, cols] = 1
+    return m.ravel(), costs[rows, cols].sum()
+
+
+def minimum_permutation_qubo(qubo, n_workers=None):
+    '''
+    Minimum of x^T qubo x over all valid solutions, x is a flattened permutation matrix.
+    If no coupling of the qubo can be active in a valid solution, the minimum is a linear assignment.
+    Otherwise a branch and bound assigns one row after the other with incrementally updated
+    local fields, the bound of a partial assignment is a linear assignment of the remaining rows.
+    The subtrees of the first row are searched on a process pool.
+    :param qubo: qubo matrix of dimension nodes^2
+    :param n_workers: number of processes, defaults to the number of cpus, 1 searches in this process
+    :return: flattened permutation matrix and its objective value
+    '''
+    diagonal, coupling = _prepare_permutation_qubo(np.asarray(qubo, dtype=float))
+    nodes = len(diagonal)
+    if not coupling.any():
+        return minimum_assignment(diagonal)
+
+    # incumbent: best linear assignment, ignoring couplings
+    vector, _ = minimum_assignment(diagonal)
+    upper = _energy(diagonal, coupling, vector)
+    assignment = vector.reshape(nodes, nodes).argmax(axis=1)
+
+    state = {'diagonal': diagonal, 'coupling': coupling,
+             'negative': np.minimum(coupling, 0) if (coupling < 0).any() else None}
+    if n_workers == 1:
+        init_worker(state)
+        results = [_search_subtree(col, upper) for col in range(nodes)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(state,)) as executor:
+            results = list(executor.map(_search_subtree, range(nodes), itertools.repeat(upper)))
+
+    for energy, subtree_assignment in results:
+        if subtree_assignment is not None and energy < upper:
+            upper, assignment = energy, subtree_assignment
+
+    m = np.zeros((nodes, nodes), dtype=int)
+    m[np.arange(nodes), assignment] = 1
+    return m.ravel(), upper
+
+
+def _prepare_permutation_qubo(qubo):
+    '''
+    :return: diagonal as nodes x nodes matrix and the symmetric couplings (qubo + qubo.T) of all pairs
+             that can be active in a valid solution (different row and different column)
+    '''
+    dimension = len(qubo)
+    nodes = math.isqrt(dimension)
+    index = np.arange(dimension)
+    rows, cols = index // nodes, index % nodes
+    feasible = (rows[:, None] != rows[None, :]) & (cols[:, None] != cols[None, :])
+    coupling = np.where(feasible, qubo + qubo.T, 0.0)
+    return qubo.diagonal().reshape(nodes, nodes), coupling
+
+
+def _energy(diagonal, coupling, vector):
+    return diagonal.ravel() @ vector + 0.5 * (vector @ coupling @ vector)
+
+
+def _search_subtree(col, upper):
+    '''
+    Branch and bound below the assignment of row 0 to col
+    :return: best energy and assignment (row -> column) of the subtree, assignment is None if nothing beats upper
+    '''
+    diagonal, coupling = worker_state['diagonal'], worker_state['coupling']
+    nodes = len(diagonal)
+    best = [upper, None]
+    assignment = np.zeros(nodes, dtype=int)
+    free = np.ones(nodes, dtype=bool)
+
+    assignment[0] = col
+    free[col] = False
+    field = coupling[col].copy()
+    _branch(1, assignment, free, diagonal[0, col], field, best)
+    return best[0], best[1]
+
+
+def _branch(row, assignment, free, energy, field, best):
+    diagonal, coupling, negative = worker_state['diagonal'], worker_state['coupling'], worker_state['negative']
+    nodes = len(diagonal)
+    if row == nodes:
+        if energy < best[0]:
+            best[0], best[1] = energy, assignment.copy()
+        return
+
+    free_cols = np.flatnonzero(free)
+    # cost of every remaining position given the assigned rows, negative couplings
+    # among the remaining positions are split evenly between both positions
+    costs = diagonal[row:, free_cols] + field.reshape(nodes, nodes)[row:, free_cols]
+    if negative is not None:
+        positions = (np.arange(row, nodes)[:, None] * nodes + free_cols[None, :]).ravel()
+        costs = costs + 0.5 * negative[np.ix_(positions, positions)].sum(axis=1).reshape(costs.shape)
+    rows, cols = linear_sum_assignment(costs)
+    if energy + costs[rows, cols].sum() >= best[0] - 1e-9:
+        return
+
+    for col in free_cols[np.argsort(costs[0], kind='stable')]:
+        i = row * nodes + col
+        assignment[row] = col
+        free[col] = False
+        field += coupling[i]
+        _branch(row + 1, assignment, free, energy + diagonal[row, col] + field[i], field, best)
+        field -= coupling[i]
+        free[col] = True
+
+
+def find_minimum_for_cost_function(cost_function, dimension, batch_size=None):
+    '''
+    Minimum of a cost function over all valid solutions (flattened permutation matrices)
+    :param cost_function: (vec) -> value, or (vecs) -> values if batch_size is given
+    :param dimension: length of a solution vector, nodes^2
+    :param batch_size: if given, the cost function is called with stacks of up to batch_size vectors
+    :return: minimum and its vector
+    '''
+    nodes = math.isqrt(dimension)
+    identity = np.eye(nodes, dtype=int)
     fitness = float("Inf")
     best_vec = []
-    while not end:
-        a, end = increment(a)
 
-        if tsp_qubo.validate.is_valid_solution(a):
-            result = cost_function(a)
-            if result < fitness:
-                fitness = result
-                best_vec = a.copy()
+    permutations = itertools.permutations(range(nodes))
+    while True:
+        chunk = np.array(list(itertools.islice(permutations, batch_size or 1)), dtype=int)
+        if len(chunk) == 0:
+            break
+        vecs = identity[chunk].reshape(len(chunk), dimension)
+
+        if batch_size is None:
+            results = np.array([cost_function(vecs[0])])
+        else:
+            results = np.asarray(cost_function(vecs))
+        best = int(np.argmin(results))
+        if results[best] < fitness:
+            fitness = results[best]
+            best_vec = vecs[best].copy()
 
     return fitness, best_vec
+
+
+def held_karp(distances):
+    '''
+    Shortest closed tour through all nodes, Held-Karp dynamic programming over subsets (O(2^n n^2))
+    :param distances: distance matrix, may be asymmetric
+    :return: length of the tour and the tour as list of nodes, starting at node 0
+    '''
+    distances = np.asarray(distances, dtype=float)
+    nodes = len(distances)
+    if nodes < 2:
+        return 0.0, list(range(nodes))
+
+    # subsets of the nodes 1..nodes-1, node k is bit k - 1
+    m = nodes - 1
+    cost = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=int)
+    bits = np.arange(m)
+    cost[1 << bits, bits] = distances[0, 1:]
+
+    inner = distances[1:, 1:]
+    for mask in range(1, 1 << m):
+        members = np.flatnonzero((mask >> bits) & 1)
+        if len(members) < 2:
+            continue
+        # path over mask ending in j: best path over mask without j ending in k, plus k -> j
+        previous = cost[(mask ^ (1 << members))[:, None], members[None, :]] + inner[np.ix_(members, members)].T
+        best = previous.argmin(axis=1)
+        cost[mask, members] = previous[np.arange(len(members)), best]
+        parent[mask, members] = members[best]
+
+    full = (1 << m) - 1
+    totals = cost[full] + distances[1:, 0]
+    last = int(totals.argmin())
+
+    tour = []
+    mask = full
+    while last >= 0:
+        tour.append(last + 1)
+        mask, last = mask ^ (1 << last), parent[mask, last]
+    return totals.min(), [0] + tour[::-1]
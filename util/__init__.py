@@ -1,5 +1,7 @@
 from .generate import *
 from .print_pretty import *
 from .rand import *
+from .store import *
+from .worker import *
 
-__all__ = [generate.__all__, print_pretty.__all__, rand.__all__]
+__all__ = [generate.__all__, print_pretty.__all__, rand.__all__, store.__all__, worker.__all__]
@@ -1,23 +1,20 @@
-import random
-
 import numpy as np
+from .rand import get_generator
 
 __all__ = ['generate_matrix', 'generate_array', 'generate_array_of_type', 'generate_array_binary']
 
 
 def generate_matrix(dimension):
-    return np.array([[0 for i in range(dimension)] for j in range(dimension)])
+    return np.zeros((dimension, dimension), dtype=int)
 
 
 def generate_array(length):
-    return np.array([0 for i in range(length)])
+    return np.zeros(length, dtype=int)
 
 
 def generate_array_of_type(data_type, length):
-    return np.array([data_type for i in range(length)])
-
-
-def generate_array_binary(length):
-    return np.array([bool(random.getrandbits(1)) for i in range(length)])
+    return np.full(length, data_type)
 
 
+def generate_array_binary(length, rng : np.random.Generator = None):
+    return get_generator(rng).random(length) < 0.5
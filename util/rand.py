@@ -2,25 +2,40 @@ import numpy as np
 import random
 
 __all__ = ['random_float_between_0_1_uniform', 'random_0_1', 'random_int_range', 'random_sequence_0_1',
-           'random_sequence_binary']
+           'random_sequence_binary', 'get_generator']
 
 
-def random_float_between_0_1_uniform():
+def get_generator(rng : np.random.Generator = None) -> np.random.Generator:
+    '''
+    :param rng: generator to use, if not given a new one is seeded from the random module,
+                so random.seed keeps results reproducible
+    :return: numpy random generator
+    '''
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    return rng
+
+
+def random_float_between_0_1_uniform(rng : np.random.Generator = None):
+    if rng is not None:
+        return rng.random()
     return random.uniform(0, 1)
 
 
-def random_0_1():
-    r = random.uniform(0, 1)
+def random_0_1(rng : np.random.Generator = None):
+    r = random_float_between_0_1_uniform(rng)
     return round(r)
 
 
-def random_int_range(min, max):
+def random_int_range(min, max, rng : np.random.Generator = None):
+    if rng is not None:
+        return int(rng.integers(min, max))
     return random.randrange(min, max)
 
 
-def random_sequence_0_1(length):
-    return np.array([random_0_1() for i in range(length)])
+def random_sequence_0_1(length, rng : np.random.Generator = None):
+    return np.rint(get_generator(rng).random(length)).astype(int)
 
 
-def random_sequence_binary(length):
-    return np.array([bool(random.getrandbits(1)) for i in range(length)])
+def random_sequence_binary(length, rng : np.random.Generator = None):
+    return get_generator(rng).random(length) < 0.5
@@ -0,0 +1,199 @@
+import json
+import os
+
+import numpy as np
+
+__all__ = ['InstanceStore']
+
+
+class InstanceStore():
+    '''
+    Index over the instances of a json file with one binary payload (.npz) per instance.
+    The store is built from the json on first use and kept next to it (<json file>.store), it is rebuilt
+    whenever the json file changes. Numeric lists of an instance are stored as arrays, all other
+    values in the manifest. Loaded instances are cached in the process. Files are written under per process
+    temporary names and renamed, so several processes can build the store at once. If the store cannot be
+    written (read only location), the instances are kept in memory.
+    '''
+    manifest_name = 'manifest.json'
+
+    def __init__(self, json_path : str, list_key : str = None, store_path : str = None):
+        '''
+        :param json_path: json file with a list of instances (dicts)
+        :param list_key: key of the instance list if the json file holds a dict, e.g. 'problems'
+        :param store_path: directory of the store, defaults to <json_path>.store
+        '''
+        self.json_path = json_path
+        self.list_key = list_key
+        self.store_path = json_path + '.store' if store_path is None else store_path
+        self._manifest = None
+        self._cache = {}
+        self._memory = {} # arrays of the instances if the store could not be written
+
+
+    def __len__(self):
+        return len(self.manifest['instances'])
+
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        return self._manifest
+
+
+    def names(self) -> list:
+        return [entry['fields'].get('name') for entry in self.manifest['instances']]
+
+
+    def index(self, name) -> int:
+        '''
+        :return: index of the first instance with the given name
+        '''
+        return self.names().index(name)
+
+
+    def get(self, index : int) -> dict:
+        '''
+        :param index: position of the instance in the json list
+        :return: instance as new dict, numeric lists are returned as read only numpy arrays
+        '''
+        if index < 0:
+            index += len(self)
+        if index not in self._cache:
+            entry = self.manifest['instances'][index]
+            if entry['file'] is None:
+                arrays = self._memory[index]
+            else:
+                with np.load(os.path.join(self.store_path, entry['file'])) as payload:
+                    arrays = {key: payload[key] for key in entry['arrays']}
+            for array in arrays.values():
+                array.flags.writeable = False
+            self._cache[index] = {key: arrays[key] if key in arrays else entry['fields'][key] for key in entry['keys']}
+        return dict(self._cache[index])
+
+
+    def append(self, instance : dict):
+        '''
+        Appends an instance to the store and to the json file, the json file is extended at its end
+        without being rewritten. The instance list has to be the last value of the json file.
+        '''
+        manifest = self.manifest
+        entry = self._write_payload(len(manifest['instances']), instance)
+        self._append_json(instance)
+        manifest['source'] = self._source_key()
+        manifest['instances'].append(entry)
+        self._write_manifest(manifest)
+
+
+    def clear_cache(self):
+        self._cache = {}
+
+
+    def _source_key(self):
+        stat = os.stat(self.json_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.store_path, self.manifest_name)) as f:
+                manifest = json.load(f)
+            if manifest['source'] == self._source_key():
+                return manifest
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._build()
+
+
+    def _build(self):
+        source = self._source_key()
+        with open(self.json_path) as f:
+            data = json.load(f)
+        instances = data if self.list_key is None else data[self.list_key]
+
+        manifest = {'source': source, 'instances': []}
+        try:
+            os.makedirs(self.store_path, exist_ok=True)
+            for index, instance in enumerate(instances):
+                manifest['instances'].append(self._write_payload(index, instance))
+            self._write_manifest(manifest)
+        except OSError: # read only location, the instances are kept in memory
+            manifest['instances'] = []
+            for index, instance in enumerate(instances):
+                arrays, fields = _split(instance)
+                self._memory[index] = arrays
+                manifest['instances'].append(_entry(None, instance, arrays, fields))
+        return manifest
+
+
+    def _write_payload(self, index, instance):
+        arrays, fields = _split(instance)
+        file = f'{index:06d}.npz'
+        path = os.path.join(self.store_path, file)
+        with open(_temp_path(path), 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(_temp_path(path), path)
+        return _entry(file, instance, arrays, fields)
+
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.store_path, self.manifest_name)
+        with open(_temp_path(path), 'w') as f:
+            json.dump(manifest, f)
+        os.replace(_temp_path(path), path)
+
+
+    def _append_json(self, instance):
+        text = json.dumps(_to_json(instance)).encode()
+        with open(self.json_path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            start = max(0, size - 4096)
+            f.seek(start)
+            tail = f.read()
+            end = tail.rindex(b']') # closing bracket of the instance list
+            separator = b'' if tail[:end].rstrip().endswith(b'[') else b', '
+            f.seek(start + end)
+            f.write(separator + text + tail[end:])
+
+
+def _split(instance):
+    '''
+    :return: numeric lists of the instance as arrays and all other values
+    '''
+    arrays, fields = {}, {}
+    for key, value in instance.items():
+        array = _numeric_array(value)
+        if array is None:
+            fields[key] = value
+        else:
+            arrays[key] = array
+    return arrays, fields
+
+
+def _entry(file, instance, arrays, fields):
+    return {'file': file, 'keys': list(instance), 'arrays': list(arrays), 'fields': _to_json(fields)}
+
+
+def _temp_path(path):
+    # unique per process, concurrent writers of the same file do not interfere
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def _numeric_array(value):
+    '''
+    :return: value as numpy array if it is a (nested) list of numbers, otherwise None
+    '''
+    if not isinstance(value, (list, np.ndarray)) or len(value) == 0:
+        return None
+    try:
+        array = np.asarray(value)
+    except ValueError: # ragged lists
+        return None
+    if array.dtype.kind not in 'biuf':
+        return None
+    return array
+
+
+def _to_json(value):
+    return json.loads(json.dumps(value, default=lambda o: o.tolist()))
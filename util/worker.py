@@ -0,0 +1,12 @@
+__all__ = ['worker_state', 'init_worker']
+
+# read only state of a worker process, set once by init_worker
+worker_state = {}
+
+
+def init_worker(state : dict):
+    '''
+    Initializer of a process pool, the state is pickled once per worker instead of once per task
+    :param state: values by name, read by the tasks from worker_state
+    '''
+    worker_state.update(state)